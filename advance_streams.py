@@ -1,12 +1,14 @@
 import sys
 import json
+import time
 import discord
+import concurrent.futures
 from datetime import timezone, datetime, timedelta
 
 import core.schedule as schedule
 
-if "-h" in sys.argv or len(sys.argv) != 5:
-    print("""Usage: {} <data sheet.xlsx> <day> <time end> <time start>
+if "-h" in sys.argv or len(sys.argv) < 5:
+    print("""Usage: {} <data sheet.xlsx> <day> <time end> <time start> [--concurrent] [--deadline <seconds>]
 
     Advance the streams to the next broadcasts to be made live, and make those broadcasts live.
     Will take offline the broadcasts that ended within the [<time end>, <time start>] interval
@@ -20,10 +22,22 @@ if "-h" in sys.argv or len(sys.argv) != 5:
         <time start>        Specify the latest start time of the next sessions that should be
                             made live. Specify as HHMM or none to indicate no following sessions,
                             i.e., the sessions being ended are the end of the day.
+
+        --concurrent        Stop and start the streams on each computer in parallel. The streams
+                            on the same computer are still stopped before they're started again.
+
+        --deadline          The number of seconds after starting to advance the streams by which
+                            each stream should be stopped or started (default 30), streams that
+                            take longer are reported as late in --concurrent mode.
     """.format(sys.argv[0]))
     sys.exit(0)
 
-database = schedule.Database(sys.argv[1], youtube=True, use_pickled_credentials=True)
+run_concurrently = "--concurrent" in sys.argv
+deadline = 30
+if "--deadline" in sys.argv:
+    deadline = float(sys.argv[sys.argv.index("--deadline") + 1])
+
+database = schedule.Database(sys.argv[1], youtube=True, use_pickled_credentials=True, cache=True)
 # Fill in the computer stream key IDs
 database.populate_stream_key_ids()
 day = database.get_day(sys.argv[2])
@@ -47,30 +61,82 @@ else:
 print("Ending broadcasts whose sessions end in the interval [{}, {}]".format(time_end, time_start))
 print("Advancing streams to broadcasts whose sessions start in the interval [{}, {}]".format(time_end, time_start))
 
-end_sessions = []
-start_sessions = []
-for k, v in day.get_sessions(False).items():
-    time = v.session_time()
-    if time[1] >= time_end and time[1] <= time_start:
-        end_sessions.append(v)
-    elif time[0] >= time_end and time[0] <= time_start:
-        start_sessions.append(v)
-
-print("=" * 10 + "\nEnding sessions:")
-for s in end_sessions:
-    print(s)
-    s.stop_streaming()
+intervals = day.session_intervals()
+end_sessions = intervals.ending_in(time_end, time_start)
+start_sessions = [s for s in intervals.starting_in(time_end, time_start) if not s in end_sessions]
+
+# Look up the status of all the broadcasts and streams at once instead of for each session
+streamed_sessions = {s for s in end_sessions + start_sessions if s.timeslot_entry(0, "Youtube Broadcast").value}
+broadcast_statuses = database.get_broadcast_statuses([s.youtube_broadcast_id() for s in streamed_sessions])
+stream_statuses = database.get_stream_statuses([s.stream_key_id() for s in start_sessions])
+
+def stop(s):
+    if s in streamed_sessions:
+        s.stop_streaming(broadcast_statuses.get(s.youtube_broadcast_id()))
+    else:
+        s.stop_streaming()
     non_consent_text = "Does not consent to video recording, Will edit out in post"
     if non_consent_text in s.special_notes():
         print("Make video {} private, non-consenting presentation".format(
             s.timeslot_entry(0, "Youtube Broadcast").value))
-    print("-----")
 
-print("=" * 10 + "\nStarting sessions:")
-for s in start_sessions:
-    print(s)
-    s.start_streaming()
-    print("-----")
+def start(s):
+    if s in streamed_sessions:
+        s.start_streaming(stream_statuses.get(s.stream_key_id()), broadcast_statuses.get(s.youtube_broadcast_id()))
+    else:
+        s.start_streaming()
+
+# Run the stops and starts of a computer's streams in order, returning the
+# (stop/start, session, seconds taken since advancing began, error) of each
+def advance_computer(transitions):
+    results = []
+    for transition, s in transitions:
+        error = None
+        try:
+            transition(s)
+        except Exception as e:
+            error = e
+        results.append((transition, s, time.monotonic() - advance_begin, error))
+    return results
+
+if run_concurrently:
+    # The streams on each computer are advanced in parallel with the other computers.
+    # Sessions without a computer (e.g., Zoom only) don't share a stream key with any other
+    computer_transitions = {}
+    for s in end_sessions:
+        computer_transitions.setdefault(s.timeslot_entry(0, "Computer").value or s, []).append((stop, s))
+    for s in start_sessions:
+        computer_transitions.setdefault(s.timeslot_entry(0, "Computer").value or s, []).append((start, s))
+
+    advance_begin = time.monotonic()
+    results = []
+    if len(computer_transitions) > 0:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(computer_transitions)) as executor:
+            for computer_results in executor.map(advance_computer, computer_transitions.values()):
+                results.extend(computer_results)
+
+    print("=" * 10 + "\nAdvanced streams:")
+    for transition, s, seconds, error in sorted(results, key=lambda r: r[2]):
+        status = "done"
+        if error != None:
+            status = "FAILED ({})".format(error)
+        elif seconds > deadline:
+            status = "LATE"
+        print("{} {}: {} in {:.1f}s".format(transition.__name__.capitalize(), s.event_session_title(), status, seconds))
+    print("{} of {} streams advanced within the {}s deadline".format(
+        len([r for r in results if r[3] == None and r[2] <= deadline]), len(results), deadline))
+else:
+    print("=" * 10 + "\nEnding sessions:")
+    for s in end_sessions:
+        print(s)
+        stop(s)
+        print("-----")
+
+    print("=" * 10 + "\nStarting sessions:")
+    for s in start_sessions:
+        print(s)
+        start(s)
+        print("-----")
 
 # Annoying but have to run bot to post the starting/ending messages
 client = discord.Client()
@@ -102,10 +102,14 @@ else:
 warnings_table = warnings_db.get_table("Sheet")
 warnings_table.set_index(["video", "container", "resolution", "video_codec", "audio_codec", \
     "subtitles", "corrupted", "length", "critical", "emailed", "correction_due"])
+warnings_table.add_lookup("video")
 
 # Walk through the current directories to find unassigned videos
 # and get their lengths
 unassigned_videos = []
+# The warnings to write to existing rows of the table, and the new ones to append
+updated_warnings = {}
+new_warnings = []
 video_root_path = os.path.normpath(sys.argv[2])
 for path, dirs, files in os.walk(video_root_path):
     for f in files:
@@ -148,21 +152,23 @@ for path, dirs, files in os.walk(video_root_path):
                         if w.is_error():
                             warning_info["critical"] = "YES"
 
-                    row = None
                     entry = warnings_table.find("video", relpath)
                     if len(entry) == 0:
-                        row = warnings_table.append_row(warning_info)
+                        new_warnings.append(warning_info)
                     else:
-                        row = entry[0]
-                        warnings_table.write_row(row, warning_info)
-
-                    if "critical" in warning_info:
-                        warnings_table.entry(row, "critical").style = "Bad"
+                        updated_warnings[entry[0]] = warning_info
                 if "critical" in warning_info:
                     print("Critical encoding error for {}! Warnings = {}".format(filename, warnings))
                     continue
                 unassigned_videos.append(video)
 
+warnings_table.write_rows(updated_warnings)
+new_rows = warnings_table.append_rows(new_warnings)
+warning_rows = list(updated_warnings.items()) + list(zip(new_rows, new_warnings))
+for row, warning_info in warning_rows:
+    if "critical" in warning_info:
+        warnings_table.entry(row, "critical").style = "Bad"
+
 warnings_db.save(sys.argv[3])
 
 # Divide the videos evenly among the N SVs and output a sheet for
@@ -201,6 +207,7 @@ for i in range(len(volunteers)):
     ws.set_index(index)
 
     task_length = 0
+    assigned_rows = []
     with ZipFile("sv_assignment_{}_{}.zip".format(assignment_suffix, i), "w") as archive:
         for r in range(len(sv[2])):
             task_length += sv[2][r].length
@@ -222,12 +229,13 @@ for i in range(len(volunteers)):
                 "Video File": video_relpath,
                 "Subtitles File": subtitles_relpath
             }
-            ws.append_row(info)
+            assigned_rows.append(info)
             archive.write(video_path, arcname=video_relpath)
             if subtitles_path:
                 archive.write(subtitles_path, arcname=subtitles_relpath)
 
-    last_row = ws.table.max_row
+    ws.append_rows(assigned_rows)
+    last_row = ws.max_row()
     ws.entry(last_row + 1, 1).value = "Total Task Time: {}minutes".format(round(task_length / 60))
     ws.entry(last_row + 1, 1).style = "Headline 1"
 
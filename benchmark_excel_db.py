@@ -0,0 +1,197 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import tracemalloc
+import openpyxl
+
+import core.excel_db as excel_db
+
+USAGE = """Usage: {} [--rows N[,N...]] [--modes mode[,mode...]] [--out results.json]
+
+    Benchmark the core.excel_db operations on synthetic schedule workbooks and
+    print the wall time and peak memory of each as JSON. The operations are timed
+    in one pass and their memory is traced in another, since tracing slows them down.
+
+    Options:
+        --rows      The number of rows in the day sheet of each workbook benchmarked
+                    (default 1000,10000,100000)
+
+        --modes     The modes to open the workbooks in: live, snapshot, read_only,
+                    cache, cache_warm and journal (default live,snapshot,read_only).
+                    cache opens the workbook without a sheet cache (and builds it),
+                    cache_warm opens it with an up to date sheet cache
+
+        --out       Also write the results to this file
+"""
+
+# The columns of the day sheets, as used by core.schedule
+DAY_SHEET_INDEX = ["Time Slot", "Event", "Session", "Time Slot Title", "Time Slot Type",
+        "Event Type", "Event Prefix", "Session ID", "UID", "Computer", "Contributor(s)",
+        "Contributor Email(s)", "Authors", "Chair(s)", "Chair Email(s)", "Organizer(s)",
+        "Organizer Email(s)", "Special Notes", "Speaker Photo", "Custom Title Image",
+        "Video File Name", "Youtube Broadcast", "Youtube Control Room", "Youtube Chat ID",
+        "Zoom URL", "Zoom Meeting ID", "Zoom Password", "Discord Link", "Event URL"]
+
+# The number of time slots in each session and the number of sessions
+# between each break of the synthetic schedule
+SESSION_TIMESLOTS = 4
+SESSIONS_PER_BREAK = 3
+
+# The number of lookups timed for entry and find
+NUM_LOOKUPS = 200
+
+# The number of rows timed for append_row
+NUM_APPENDS = 1000
+
+# Build a workbook with a computers sheet and a day sheet with num_rows rows of sessions
+def make_workbook(filename, num_rows):
+    workbook = openpyxl.Workbook()
+    computers = workbook.active
+    computers.title = "computers"
+    computers.append(["ID", "Youtube Stream Key", "Youtube Stream Key ID"])
+    for c in "ABCDEFGH":
+        computers.append([c, "stream-key-" + c, None])
+
+    day = workbook.create_sheet(title="sunday")
+    day.append(DAY_SHEET_INDEX)
+    day.append(["Sunday 10/25"])
+    session = 0
+    for r in range(num_rows):
+        start = (r * 15) % (24 * 60)
+        time_slot = "{:02d}{:02d}-{:02d}{:02d}".format(start // 60, start % 60,
+                (start + 15) // 60 % 24, (start + 15) % 60)
+        if r % (SESSION_TIMESLOTS * SESSIONS_PER_BREAK + 1) == SESSION_TIMESLOTS * SESSIONS_PER_BREAK:
+            day.append([time_slot, "BREAK", "BREAK"])
+            continue
+        if r % (SESSION_TIMESLOTS * SESSIONS_PER_BREAK + 1) % SESSION_TIMESLOTS == 0:
+            session += 1
+        event = "Event {}".format(session % 50)
+        info = {
+            "Time Slot": time_slot,
+            "Event": event,
+            "Session": "Session {}".format(session),
+            "Time Slot Title": "Presentation {}".format(r),
+            "Time Slot Type": "Recorded Talk",
+            "Event Type": "Paper Session",
+            "Event Prefix": "e{}".format(session % 50),
+            "Session ID": "s{}".format(session),
+            "UID": "u{}".format(r),
+            "Computer": "ABCDEFGH"[session % 8],
+            "Contributor(s)": "Presenter {}|Coauthor {}".format(r, r + 1),
+            "Contributor Email(s)": "presenter{}@example.com|coauthor{}@example.com".format(r, r + 1),
+            "Authors": "Presenter {}|Coauthor {}|Advisor {}".format(r, r + 1, session),
+            "Chair(s)": "Chair {}".format(session),
+            "Chair Email(s)": "chair{}@example.com".format(session),
+            "Organizer(s)": "Organizer {}".format(session % 50),
+            "Organizer Email(s)": "organizer{}@example.com".format(session % 50),
+            "Special Notes": "Live Captions" if r % 7 == 0 else None,
+            "Video File Name": "videos/u{}.mp4".format(r)
+        }
+        day.append([info.get(c) for c in DAY_SHEET_INDEX])
+    workbook.save(filename)
+
+# The excel_db.open options for each mode
+MODE_OPTIONS = {
+    "live": {},
+    "snapshot": {"snapshot": True},
+    "read_only": {"read_only": True},
+    "cache": {"cache": True},
+    "cache_warm": {"cache": True},
+    "journal": {"journal": True}
+}
+
+# Time fcn, returning its result along with the wall time (s) it took
+def time_call(fcn):
+    start = time.perf_counter()
+    result = fcn()
+    return result, time.perf_counter() - start
+
+# Trace fcn's memory use, returning its result along with the peak memory (bytes) it took
+def trace_memory(fcn):
+    tracemalloc.reset_peak()
+    base_memory = tracemalloc.get_traced_memory()[0]
+    result = fcn()
+    return result, tracemalloc.get_traced_memory()[1] - base_memory
+
+# Remove the sheet cache and journal left by a previous pass, and build
+# the sheet cache if the mode opens the workbook with it up to date
+def prepare(filename, mode):
+    for f in [excel_db.sheet_cache_filename(filename), excel_db.journal_filename(filename)]:
+        if os.path.exists(f):
+            os.remove(f)
+    if mode == "cache_warm":
+        excel_db.open(filename, cache=True).close()
+
+# Run the operations on the workbook opened in the mode, returning the
+# {operation: measurement} taken by measure (time_call or trace_memory)
+def benchmark(filename, num_rows, mode, out_dir, measure):
+    options = MODE_OPTIONS[mode]
+    results = {}
+
+    db, results["open"] = measure(lambda: excel_db.open(filename, **options))
+    table, results["get_table"] = measure(lambda: db.get_table("sunday"))
+    _, results["load_index"] = measure(table.load_index)
+
+    max_row = table.max_row()
+    rows = [2 + (i * (max_row - 1)) // NUM_LOOKUPS for i in range(NUM_LOOKUPS)]
+    _, results["entry"] = measure(lambda: [table.entry(r, "UID").value for r in rows])
+    uids = ["u{}".format(r - 2) for r in rows]
+    _, results["find"] = measure(lambda: [table.find("UID", u) for u in uids])
+    table.add_lookup("UID")
+    _, results["find_lookup"] = measure(lambda: [table.find("UID", u) for u in uids])
+    _, results["find_if"] = measure(lambda: table.find_if(lambda r: r["Event"].value == "BREAK"))
+    _, results["items"] = measure(lambda: [r["Session"].value for r in table.items()])
+
+    if mode != "read_only":
+        new_rows = [{"Time Slot": "0000-0015", "Event": "Appended", "UID": "a{}".format(i)}
+                for i in range(NUM_APPENDS)]
+        _, results["append_row"] = measure(lambda: [table.append_row(r) for r in new_rows])
+        save_filename = os.path.join(out_dir, "saved-{}-{}.xlsx".format(num_rows, mode))
+        _, results["save"] = measure(lambda: db.save(save_filename))
+
+    if mode == "journal":
+        db.close_journal()
+    db.close()
+    return results
+
+if "-h" in sys.argv:
+    print(USAGE.format(sys.argv[0]))
+    sys.exit(0)
+
+row_counts = [1000, 10000, 100000]
+modes = ["live", "snapshot", "read_only"]
+output_file = None
+for i in range(1, len(sys.argv)):
+    if sys.argv[i] == "--rows":
+        row_counts = [int(n) for n in sys.argv[i + 1].split(",")]
+    elif sys.argv[i] == "--modes":
+        modes = sys.argv[i + 1].split(",")
+    elif sys.argv[i] == "--out":
+        output_file = sys.argv[i + 1]
+
+results = []
+with tempfile.TemporaryDirectory() as out_dir:
+    for num_rows in row_counts:
+        filename = os.path.join(out_dir, "schedule-{}.xlsx".format(num_rows))
+        make_workbook(filename, num_rows)
+        for mode in modes:
+            print("Benchmarking {} rows opened {}".format(num_rows, mode), file=sys.stderr)
+            prepare(filename, mode)
+            seconds = benchmark(filename, num_rows, mode, out_dir, time_call)
+            prepare(filename, mode)
+            tracemalloc.start()
+            peak_bytes = benchmark(filename, num_rows, mode, out_dir, trace_memory)
+            tracemalloc.stop()
+            results.append({
+                "rows": num_rows,
+                "mode": mode,
+                "file_bytes": os.path.getsize(filename),
+                "operations": dict([(op, {"seconds": seconds[op], "peak_bytes": peak_bytes[op]}) for op in seconds])
+            })
+
+print(json.dumps(results, indent=4))
+if output_file:
+    with open(output_file, "w") as f:
+        json.dump(results, f, indent=4)
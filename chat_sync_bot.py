@@ -161,7 +161,7 @@ class Bot:
                 print("Error sending message '{}' to youtube: {}".format(m, e))
 
 
-database = schedule.Database(sys.argv[1], youtube=True, use_pickled_credentials=True)
+database = schedule.Database(sys.argv[1], youtube=True, use_pickled_credentials=True, cache=True)
 client = discord.Client()
 bots = []
 
@@ -173,26 +173,24 @@ async def on_ready():
             hour=int(sys.argv[3][0:2]), minute=int(sys.argv[3][2:4]), tzinfo=schedule.conf_tz)
 
     print("Bot handling sessions:")
-    for k, v in day.get_sessions(False).items():
-        time = v.session_time()
-        if bot_time >= time[0] and bot_time <= time[1]:
-            if not v.timeslot_entry(0, "Youtube Chat ID").value or not v.timeslot_entry(0, "Discord Link").value:
-                print("No chat sync for {}".format(v.event_session_title()))
-                continue
-
-            youtube_chat_id = v.timeslot_entry(0, "Youtube Chat ID").value
-            guild_id, channel_id = v.discord_ids()
-            guild = [g for g in client.guilds if str(g.id) == guild_id][0]
-            for cat in guild.categories:
-                channel = [c for c in guild.text_channels if str(c.id) == channel_id]
-                if len(channel) > 0:
-                    channel = channel[0]
-                    break
-            print(v.event_session_title())
-            await channel.send("The chat will now be synchronized bidirectionally with YouTube")
-            # NOTE: You'll want to update this information with where your warn zoom links/nosync bot is watching for $nosync commands
-            await channel.send("You can prevent synchronization by prefixing your message with the - character, or completely by typing $nosync in #youtube-sync-commands")
-            bots.append(Bot(youtube_chat_id, database.auth.youtube, channel, client))
+    for v in day.session_intervals().live_at(bot_time):
+        if not v.timeslot_entry(0, "Youtube Chat ID").value or not v.timeslot_entry(0, "Discord Link").value:
+            print("No chat sync for {}".format(v.event_session_title()))
+            continue
+
+        youtube_chat_id = v.timeslot_entry(0, "Youtube Chat ID").value
+        guild_id, channel_id = v.discord_ids()
+        guild = [g for g in client.guilds if str(g.id) == guild_id][0]
+        for cat in guild.categories:
+            channel = [c for c in guild.text_channels if str(c.id) == channel_id]
+            if len(channel) > 0:
+                channel = channel[0]
+                break
+        print(v.event_session_title())
+        await channel.send("The chat will now be synchronized bidirectionally with YouTube")
+        # NOTE: You'll want to update this information with where your warn zoom links/nosync bot is watching for $nosync commands
+        await channel.send("You can prevent synchronization by prefixing your message with the - character, or completely by typing $nosync in #youtube-sync-commands")
+        bots.append(Bot(youtube_chat_id, database.auth.youtube, channel, client))
 
 @client.event
 async def on_message(msg):
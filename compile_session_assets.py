@@ -19,7 +19,7 @@ def list_to_html(l):
         return ""
     return "<ul>" + "</li>".join(["<li>" + x for x in l]) + "</li></ul>"
 
-database = schedule.Database(sys.argv[1])
+database = schedule.Database(sys.argv[1], snapshot=True)
 day = database.get_day(sys.argv[2])
 data_dir = os.path.normpath(sys.argv[3])
 output_root = os.path.normpath(sys.argv[4])
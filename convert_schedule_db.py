@@ -0,0 +1,19 @@
+import os
+import sys
+
+import core.sqlite_db as sqlite_db
+
+# This script converts the schedule between the Excel workbook and an SQLite
+# database, which can be used in place of the workbook by the scripts while
+# the conference is running. Export the database back to Excel to upload it to
+# Google sheets.
+
+if len(sys.argv) != 3:
+    print("Usage: {} <input (.xlsx|.db)> <output (.db|.xlsx)>".format(sys.argv[0]))
+    sys.exit(1)
+
+if os.path.splitext(sys.argv[1])[1] == ".xlsx":
+    sqlite_db.import_workbook(sys.argv[1], sys.argv[2])
+else:
+    sqlite_db.export_workbook(sqlite_db.open(sys.argv[1], read_only=True), sys.argv[2])
+print("Converted {} to {}".format(sys.argv[1], sys.argv[2]))
@@ -3,6 +3,7 @@ import os
 import sys
 import boto3
 import pickle
+import threading
 import google_auth_oauthlib.flow
 import googleapiclient.discovery
 import googleapiclient.errors
@@ -44,7 +45,9 @@ class Authentication:
             }
 
             self.email = None
-            self.youtube = None
+            self.youtube_credentials = None
+            # The YouTube API client isn't thread safe, so each thread builds its own
+            self.thread_clients = threading.local()
 
             if email:
                 self.email = boto3.client("ses",
@@ -53,7 +56,17 @@ class Authentication:
                         region_name=auth["aws"]["region"])
 
             if youtube:
-                self.youtube = self.authenticate_youtube(auth, use_pickled_credentials)
+                self.youtube_credentials = self.authenticate_youtube(auth, use_pickled_credentials)
+
+    # The YouTube API client for the calling thread
+    @property
+    def youtube(self):
+        if not self.youtube_credentials:
+            return None
+        if not hasattr(self.thread_clients, "youtube"):
+            self.thread_clients.youtube = googleapiclient.discovery.build("youtube", "v3",
+                    credentials=self.youtube_credentials)
+        return self.thread_clients.youtube
 
     def authenticate_youtube(self, auth, use_pickled_credentials):
         yt_scopes = ["https://www.googleapis.com/auth/youtube",
@@ -78,5 +91,5 @@ class Authentication:
                 with open(pickle_file, "wb") as f:
                     pickle.dump(credentials, f)
 
-        return googleapiclient.discovery.build("youtube", "v3", credentials=credentials)
+        return credentials
 
@@ -0,0 +1,73 @@
+import numpy as np
+
+from core.computer_schedule import SESSION_BUFFER
+
+# The number of overrun scenarios simulated at once
+SCENARIO_BATCH_SIZE = 1000
+
+# The times each session needs a computer for, as arrays of seconds since the earliest
+# time a session needs a computer. need_at is when setup for the session starts,
+# end is when the session ends (without the buffer)
+class SessionTimes:
+    def __init__(self, sessions, setup_time=None):
+        if setup_time == None:
+            setup_time = lambda s: s.setup_time()
+        times = [s.session_time() for s in sessions]
+        need_at = [t[0] - setup_time(s) for s, t in zip(sessions, times)]
+        self.sessions = sessions
+        self.origin = min(need_at) if need_at else None
+        self.need_at = np.array([(t - self.origin).total_seconds() for t in need_at], dtype=np.float64)
+        self.end = np.array([(t[1] - self.origin).total_seconds() for t in times], dtype=np.float64)
+
+    def __len__(self):
+        return len(self.sessions)
+
+# Count the computers in use at each session's need_at time for each scenario,
+# given the times the computers are released (rows of release are scenarios).
+# A computer released at the time a session needs one can be reused for it
+def computers_in_use(need_at, release):
+    num_scenarios, num_sessions = release.shape
+    order = np.argsort(need_at, kind="stable")
+    needs = need_at[order]
+    # The sessions which have started by each need time, including ties
+    started = np.searchsorted(needs, needs, side="right")
+
+    # Count the releases at or before each need time in each scenario by searching
+    # all scenarios at once, offsetting each scenario's times so they don't overlap
+    releases = np.sort(release, axis=1)
+    span = max(releases.max(), needs.max()) - min(releases.min(), needs.min()) + 1.0
+    offsets = (np.arange(num_scenarios, dtype=np.float64) * span)[:, np.newaxis]
+    released = np.searchsorted((releases + offsets).ravel(), (needs[np.newaxis, :] + offsets).ravel(), side="right")
+    released = released.reshape(num_scenarios, num_sessions) - np.arange(num_scenarios)[:, np.newaxis] * num_sessions
+    return started[np.newaxis, :] - released
+
+# Get the minimum number of computers needed to stream the sessions, where each
+# computer is busy from the session's setup until buffer after it ends
+def minimum_computers(session_times, buffer=SESSION_BUFFER):
+    if len(session_times) == 0:
+        return 0
+    release = (session_times.end + buffer.total_seconds())[np.newaxis, :]
+    return int(computers_in_use(session_times.need_at, release).max())
+
+# Simulate the sessions running over and get the number of computers needed in each
+# scenario. Each session overruns with probability overrun_probability, by an
+# exponentially distributed time with mean mean_overrun
+def simulate_overruns(session_times, num_scenarios, overrun_probability, mean_overrun,
+        buffer=SESSION_BUFFER, seed=None):
+    if len(session_times) == 0:
+        return np.zeros(num_scenarios, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    computers_needed = []
+    # Scenarios are simulated in batches to bound the memory used
+    for batch_start in range(0, num_scenarios, SCENARIO_BATCH_SIZE):
+        shape = (min(SCENARIO_BATCH_SIZE, num_scenarios - batch_start), len(session_times))
+        overruns = rng.exponential(mean_overrun.total_seconds(), size=shape)
+        overruns *= rng.random(size=shape) < overrun_probability
+        release = session_times.end[np.newaxis, :] + buffer.total_seconds() + overruns
+        computers_needed.append(computers_in_use(session_times.need_at, release).max(axis=1))
+    return np.concatenate(computers_needed)
+
+# Get the probability of a session not having a computer available for each number
+# of computers, given the computers needed in each simulated scenario
+def conflict_probability(computers_needed, computer_counts):
+    return {c: float(np.mean(computers_needed > c)) for c in computer_counts}
@@ -0,0 +1,204 @@
+import heapq
+import bisect
+from datetime import timedelta
+
+# A computer is available again this long after the end of the session it streamed
+SESSION_BUFFER = timedelta(minutes=10)
+
+# A session and the computer assigned to stream it, which is None if no computer
+# was available when the session needs one
+class ScheduledSession:
+    __slots__ = ("session", "computer", "need_at", "available_at")
+
+    # need_at is when the session needs the computer for setup, available_at
+    # when the computer assigned (or the earliest one, if none was) became available
+    def __init__(self, session, computer, need_at, available_at):
+        self.session = session
+        self.computer = computer
+        self.need_at = need_at
+        self.available_at = available_at
+
+# The assignment of computers to sessions made by assign_computers
+class ComputerSchedule:
+    def __init__(self, computers):
+        # The scheduled sessions, in the order they need a computer
+        self.sessions = []
+        # The scheduled sessions that no computer was available for
+        self.conflicts = []
+        # The scheduled sessions moved off the computer streaming their event,
+        # since it was still busy, e.g., with a parallel session of the event
+        self.moved = []
+        # The scheduled sessions whose computer was changed by reassign_computers,
+        # including those that didn't have one
+        self.changed = []
+        # The scheduled sessions streamed by each computer
+        self.computer_sessions = {c: [] for c in computers}
+
+    def add(self, scheduled, moved):
+        self.sessions.append(scheduled)
+        if scheduled.computer == None:
+            self.conflicts.append(scheduled)
+            return
+        if moved:
+            self.moved.append(scheduled)
+        self.computer_sessions[scheduled.computer].append(scheduled)
+
+    # Sort the scheduled sessions in the order they need a computer
+    def sort(self):
+        key = lambda s: s.need_at
+        self.sessions.sort(key=key)
+        self.conflicts.sort(key=key)
+        self.changed.sort(key=key)
+        for c in self.computer_sessions.values():
+            c.sort(key=key)
+
+    # Get the {session: computer} assignment
+    def assignment(self):
+        return {s.session: s.computer for s in self.sessions}
+
+    # The number of computers used to stream the sessions
+    def computers_used(self):
+        return len([c for c, sessions in self.computer_sessions.items() if len(sessions) > 0])
+
+# Assign the sessions to the computers (a list of computer IDs) so each computer
+# streams one session at a time. A session needs its computer setup_time(session)
+# before it starts, and the computer is available again buffer after it ends.
+# Sessions of the same event are kept on the same computer when it's available,
+# otherwise the computer available the earliest is used. available_at is when
+# the computers are first available, or None if they're available from the start.
+# This takes O(n log m) time for n sessions and m computers.
+def assign_computers(sessions, computers, available_at=None, setup_time=None, buffer=SESSION_BUFFER):
+    if setup_time == None:
+        setup_time = lambda s: s.setup_time()
+
+    # Sessions are assigned in the order they need a computer
+    needs = []
+    for i, s in enumerate(sessions):
+        start, end = s.session_time()
+        needs.append((start - setup_time(s), start, i, end))
+    needs.sort()
+
+    schedule = ComputerSchedule(computers)
+    if len(needs) == 0:
+        return schedule
+    if available_at == None:
+        available_at = needs[0][0]
+    if len(computers) == 0:
+        for need_at, start, i, end in needs:
+            schedule.add(ScheduledSession(sessions[i], None, need_at, None), False)
+        return schedule
+
+    # The heap of (available time, computer) may have stale entries for computers
+    # taken to keep an event on its computer, which are skipped when popped. The heap
+    # is rebuilt once it's half stale, so it stays under 2m entries
+    available = {c: available_at for c in computers}
+    free = [(available_at, i, c) for i, c in enumerate(computers)]
+    heapq.heapify(free)
+    order = {c: i for i, c in enumerate(computers)}
+    event_computer = {}
+    for need_at, start, i, end in needs:
+        session = sessions[i]
+        computer = event_computer.get(session.event)
+        moved = False
+        if computer == None or available[computer] > need_at:
+            moved = computer != None
+            while free[0][0] != available[free[0][2]]:
+                heapq.heappop(free)
+            computer = free[0][2]
+
+        if available[computer] > need_at:
+            schedule.add(ScheduledSession(session, None, need_at, available[computer]), False)
+            continue
+
+        schedule.add(ScheduledSession(session, computer, need_at, available[computer]), moved)
+        if not session.event in event_computer:
+            event_computer[session.event] = computer
+        available[computer] = end + buffer
+        heapq.heappush(free, (available[computer], order[computer], computer))
+        if len(free) > 2 * len(computers):
+            free = [(t, order[c], c) for c, t in available.items()]
+            heapq.heapify(free)
+    return schedule
+
+# Reassign the sessions to the computers after the session times have changed, keeping
+# the current {session: computer} assignment wherever it doesn't conflict. On each computer
+# the most sessions that don't overlap are kept, preferring those that aren't in retimed (the
+# sessions whose time changed) so a session that didn't move isn't moved off its computer by
+# one that did. The others and any sessions without a computer are fit into the gaps between
+# the sessions kept, preferring the computer of the session's event and then the one with the
+# smallest gap before the session. The scheduled sessions changed are listed in the schedule's
+# changed list.
+def reassign_computers(sessions, computers, current, available_at=None, setup_time=None, buffer=SESSION_BUFFER,
+        retimed=()):
+    if setup_time == None:
+        setup_time = lambda s: s.setup_time()
+
+    times = {}
+    for s in sessions:
+        start, end = s.session_time()
+        times[s] = (start - setup_time(s), end + buffer)
+
+    schedule = ComputerSchedule(computers)
+    # The sorted need and release times of the sessions kept on each computer
+    needs = {c: [] for c in computers}
+    releases = {c: [] for c in computers}
+    event_computer = {}
+    assigned = {c: [] for c in computers}
+    pending = []
+    for s in sessions:
+        if current.get(s) in assigned:
+            assigned[current.get(s)].append(s)
+        else:
+            pending.append(s)
+
+    retimed = set(retimed)
+    for c in computers:
+        # Keep the sessions that finish first, which keeps the most sessions on the computer,
+        # starting with those whose time didn't change
+        for s in sorted(assigned[c], key=lambda s: (s in retimed, times[s][1])):
+            need_at, release = times[s]
+            i = bisect.bisect_right(needs[c], need_at)
+            if (available_at != None and need_at < available_at) or \
+                    (i > 0 and releases[c][i - 1] > need_at) or \
+                    (i < len(needs[c]) and needs[c][i] < release):
+                pending.append(s)
+                continue
+            schedule.add(ScheduledSession(s, c, need_at, releases[c][i - 1] if i > 0 else available_at), False)
+            needs[c].insert(i, need_at)
+            releases[c].insert(i, release)
+            event_computer.setdefault(s.event, c)
+
+    pending.sort(key=lambda s: times[s][0])
+    for s in pending:
+        need_at, release = times[s]
+        best = None
+        best_available = None
+        for c in computers:
+            i = bisect.bisect_right(needs[c], need_at)
+            available = releases[c][i - 1] if i > 0 else available_at
+            if available != None and available > need_at:
+                continue
+            if i < len(needs[c]) and needs[c][i] < release:
+                continue
+            if c == event_computer.get(s.event):
+                best, best_available = c, available
+                break
+            if best == None or (available != None and (best_available == None or available > best_available)):
+                best, best_available = c, available
+
+        if best == None:
+            scheduled = ScheduledSession(s, None, need_at, None)
+            schedule.add(scheduled, False)
+            schedule.changed.append(scheduled)
+            continue
+
+        i = bisect.bisect_right(needs[best], need_at)
+        needs[best].insert(i, need_at)
+        releases[best].insert(i, release)
+        event_computer.setdefault(s.event, best)
+        scheduled = ScheduledSession(s, best, need_at, best_available)
+        schedule.add(scheduled, False)
+        schedule.changed.append(scheduled)
+
+    schedule.sort()
+    return schedule
@@ -0,0 +1,86 @@
+import re
+import heapq
+
+import core.schedule as schedule
+
+# The columns listing the people taking part in a time slot, separated by |
+PEOPLE_COLUMNS = ["Contributor(s)", "Chair(s)", "Organizer(s)"]
+EMAIL_COLUMNS = ["Contributor Email(s)", "Chair Email(s)", "Organizer Email(s)"]
+
+match_whitespace = re.compile("\s+")
+
+# Names are matched ignoring case and extra whitespace
+def normalize_name(name):
+    return match_whitespace.sub(" ", name).strip().casefold()
+
+def normalize_email(email):
+    return email.strip().lower()
+
+# A time slot of a session and the (normalized) names and emails of the people in it
+class BookedTimeslot:
+    __slots__ = ("session", "timeslot", "start", "end", "people")
+
+    def __init__(self, session, timeslot):
+        self.session = session
+        self.timeslot = timeslot
+        self.start, self.end = session.timeslot_time(timeslot)
+        self.people = set()
+        for c in PEOPLE_COLUMNS:
+            names = session.timeslot_entry(timeslot, c).value
+            if names:
+                self.people.update(["name:" + normalize_name(n) for n in names.split("|") if n.strip()])
+        for c in EMAIL_COLUMNS:
+            emails = session.timeslot_entry(timeslot, c).value
+            if emails:
+                self.people.update(["email:" + normalize_email(e) for e in emails.split("|") if e.strip()])
+
+    def time_slot(self):
+        return self.session.timeslot_entry(self.timeslot, "Time Slot").value
+
+# Two overlapping time slots in different sessions that have the same people in them
+class DoubleBooking:
+    def __init__(self, first, second):
+        self.first = first
+        self.second = second
+        self.people = set()
+
+# Get the booked time slots of all sessions on the days of the database
+def booked_timeslots(database, days=schedule.CONFERENCE_DAYS):
+    timeslots = []
+    table_names = database.workbook.table_names()
+    for d in days:
+        if not d in table_names:
+            continue
+        for session in database.get_day(d).get_sessions(False, records=True).values():
+            for t in range(session.num_timeslots()):
+                timeslots.append(BookedTimeslot(session, t))
+    return timeslots
+
+# Find every pair of overlapping time slots in different sessions with the same person in
+# them, by sweeping through the time slots in order of their start time and keeping the
+# time slots active at the current time for each person. This takes O(n log n + k) time
+# for n time slots with k overlaps
+def find_double_bookings(timeslots):
+    timeslots = sorted(timeslots, key=lambda t: t.start)
+    double_bookings = {}
+    # The heap of (end, i) of the active time slots, and the active time slots for each person
+    active = []
+    person_active = {}
+    for i, slot in enumerate(timeslots):
+        while len(active) > 0 and active[0][0] <= slot.start:
+            end, j = heapq.heappop(active)
+            for p in timeslots[j].people:
+                person_active[p].discard(j)
+
+        for p in slot.people:
+            for j in person_active.get(p, []):
+                if timeslots[j].session is slot.session:
+                    continue
+                if not (j, i) in double_bookings:
+                    double_bookings[(j, i)] = DoubleBooking(timeslots[j], slot)
+                double_bookings[(j, i)].people.add(p)
+
+        heapq.heappush(active, (slot.end, i))
+        for p in slot.people:
+            person_active.setdefault(p, set()).add(i)
+    return [double_bookings[k] for k in sorted(double_bookings)]
@@ -1,42 +1,402 @@
+import io
+import os
+import json
+import atexit
+import pickle
+import hashlib
 import openpyxl
+from bisect import insort
+from itertools import zip_longest
 
-def open(filename):
-    db = ExcelDb(db=openpyxl.load_workbook(filename=filename, data_only=True))
+# Bump this if the layout of the sheet cache changes to discard old caches
+SHEET_CACHE_VERSION = 2
+
+# The longest sheet cache header line we'll read
+SHEET_CACHE_MAX_HEADER = 4096
+
+# If snapshot is set, each sheet is read once into memory when it's first requested
+# and served from there, see SnapshotTable. If read_only is set the workbook is
+# streamed by openpyxl's read-only reader, parsing only the sheets that are requested
+# as snapshots, and any write to the database will raise a ReadOnlyError.
+# If cache is set the values of all the sheets are kept in a sidecar file next to
+# the workbook, which is loaded instead of parsing the workbook if it's still
+# up to date. The workbook itself is then only parsed if it's needed to save.
+# If journal is set, saving the workbook back to the same file appends the cells
+# written since the last save to a journal file instead of rewriting the workbook,
+# see ExcelDb.open_journal. A journal left next to the workbook is replayed in every
+# mode, so the writes saved to it are seen even if it was never checkpointed
+def open(filename, snapshot=False, read_only=False, cache=False, journal=False):
+    db = None
+    if cache:
+        sheets = load_sheet_cache(filename)
+        if sheets != None:
+            db = ExcelDb(snapshot=True, read_only=read_only, filename=filename, cache=True)
+            for name, sheet in sheets.items():
+                db.add_snapshot(name, SnapshotTable(None, None, read_only=read_only,
+                        columns=sheet["columns"], index=sheet["index"], name=name))
+            db.sheet_names = list(sheets.keys())
+
+    if db == None:
+        if read_only:
+            workbook = openpyxl.load_workbook(filename=filename, data_only=True, read_only=True)
+            db = ExcelDb(db=workbook, snapshot=True, read_only=True, filename=filename, cache=cache)
+        else:
+            db = ExcelDb(db=openpyxl.load_workbook(filename=filename, data_only=True),
+                    snapshot=snapshot or cache or journal, filename=filename, cache=cache)
+        if cache:
+            db.save_sheet_cache(filename)
+
+    if journal and not read_only:
+        db.open_journal(filename)
+    elif os.path.isfile(journal_filename(filename)):
+        # The journal may belong to a program that's still writing to it, so it's only read
+        db.replay_journal(read_journal(journal_filename(filename), repair=False), filename)
     return db
 
+class ReadOnlyError(Exception):
+    pass
+
+def sheet_cache_filename(filename):
+    return filename + ".cache"
+
+def hash_file(filename):
+    digest = hashlib.sha256()
+    with io.open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# The cache is valid for the workbook if it has the same path, size, modification
+# time and content as when the cache was written
+def sheet_cache_key(filename):
+    stat = os.stat(filename)
+    return {
+        "version": SHEET_CACHE_VERSION,
+        "path": os.path.abspath(filename),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "sha256": hash_file(filename)
+    }
+
+# Returns the cached {sheet name: {"columns", "index"}} for the workbook,
+# or None if there's no cache or it's out of date. The cache file starts with
+# a line of the JSON cache key, and the pickled sheets are only loaded if the
+# key matches the workbook, so a stale or foreign cache is never unpickled
+def load_sheet_cache(filename):
+    cache_file = sheet_cache_filename(filename)
+    if not os.path.isfile(cache_file):
+        return None
+    try:
+        with io.open(cache_file, "rb") as f:
+            header = f.readline(SHEET_CACHE_MAX_HEADER)
+            try:
+                key = json.loads(header)
+            except ValueError:
+                return None
+            if key != sheet_cache_key(filename):
+                return None
+            return pickle.load(f)
+    except Exception as e:
+        print("Ignoring unreadable sheet cache {}: {}".format(cache_file, e))
+        return None
+
+def journal_filename(filename):
+    return filename + ".journal"
+
+# An append-only log of the cell writes made to an ExcelDb since its workbook
+# was last written out. Writes are recorded as they're made and made durable
+# in the journal file on commit
+class Journal:
+    def __init__(self, filename):
+        self.filename = filename
+        self.pending = []
+        self.file = io.open(filename, "ab")
+
+    # Entries are tuples of ("create", sheet, index), ("value", sheet, row, col, value)
+    # or ("style", sheet, row, col, style)
+    def record(self, entry):
+        self.pending.append(entry)
+
+    def commit(self):
+        if len(self.pending) == 0:
+            return
+        data = b"".join([pickle.dumps(e, protocol=pickle.HIGHEST_PROTOCOL) for e in self.pending])
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = []
+
+    # True if there are committed entries not yet written to the workbook
+    def has_entries(self):
+        return os.fstat(self.file.fileno()).st_size > 0
+
+    def clear(self):
+        self.pending = []
+        self.file.truncate(0)
+        self.file.seek(0)
+        os.fsync(self.file.fileno())
+
+    # Close the journal, removing the file if there's nothing in it
+    def close(self):
+        empty = not self.has_entries()
+        self.file.close()
+        if empty:
+            os.remove(self.filename)
+
+# Read back the entries committed to a journal file. A partially written entry
+# at the end, e.g., if we crashed while committing, is skipped, and dropped from
+# the file if repair is set
+def read_journal(filename, repair=True):
+    entries = []
+    with io.open(filename, "r+b" if repair else "rb") as f:
+        valid_length = 0
+        while True:
+            try:
+                entries.append(pickle.load(f))
+                valid_length = f.tell()
+            except EOFError:
+                break
+            except Exception as e:
+                if repair:
+                    print("Dropping incomplete entry at the end of journal {}: {}".format(filename, e))
+                break
+        if repair:
+            f.truncate(valid_length)
+    return entries
+
 # It's nice to have an Excel file since we can paste it out to Google sheets as
 # a convenient "export". This implements a sort of database interface on top
 # of the Excel sheet to work with it on the Python side
 class ExcelDb:
-    def __init__(self, db=None):
-        if db == None:
+    def __init__(self, db=None, snapshot=False, read_only=False, filename=None, cache=False):
+        if db == None and filename == None:
             self.db = openpyxl.Workbook()
         else:
             self.db = db
+        self.snapshot = snapshot
+        self.read_only = read_only
+        # The file the workbook was opened from. If the database was loaded from the
+        # sheet cache the workbook is only parsed from it when needed, see workbook()
+        self.filename = filename
+        self.cache = cache
+        self.sheet_names = None
+        # The snapshot tables we've loaded, their modified cells are written
+        # back to the workbook when it's saved
+        self.snapshots = {}
+        # The journal and the workbook file it applies to, see open_journal
+        self.journal = None
+        self.journal_target = None
+        self.journal_registered = False
+        # The file whose journal was replayed without journaling, see replay_journal
+        self.replayed_journal = None
+
+    def add_snapshot(self, name, table):
+        table.journal = self.journal
+        self.snapshots[name] = table
+        return table
+
+    # Get the openpyxl workbook, parsing it if we were loaded from the sheet cache
+    def workbook(self):
+        if self.db == None:
+            self.db = openpyxl.load_workbook(filename=self.filename, data_only=True, read_only=self.read_only)
+            for name, t in self.snapshots.items():
+                t.db = self.db
+                t.table = self.db[name]
+        return self.db
 
     def save(self, filename):
+        if self.read_only:
+            raise ReadOnlyError("Cannot save a workbook opened read only")
+        if self.journal:
+            if os.path.abspath(filename) == os.path.abspath(self.journal_target):
+                self.journal.commit()
+                return
+            # Saving to a new file writes it out in full and moves the journal to it.
+            # Writes committed to the journal of the previous file stay there, to be
+            # replayed when that file is next opened
+            if self.journal.has_entries():
+                print("Saved writes to {} remain in journal {}".format(self.journal_target, self.journal.filename))
+            self.write_workbook(filename)
+            self.open_journal(filename)
+            return
+        self.write_workbook(filename)
+
+    def write_workbook(self, filename):
+        self.workbook()
+        for t in self.snapshots.values():
+            t.flush()
         self.db.save(filename)
+        # The writes in a journal we replayed are now in the workbook, so it's removed
+        # to not replay them over later writes
+        if self.replayed_journal != None and os.path.abspath(filename) == os.path.abspath(self.replayed_journal):
+            if os.path.isfile(journal_filename(filename)):
+                os.remove(journal_filename(filename))
+            self.replayed_journal = None
+        # Keep the cache in sync if we overwrote the cached workbook
+        if self.cache and os.path.abspath(filename) == os.path.abspath(self.filename):
+            self.save_sheet_cache(filename)
+
+    # Journal the writes made to the workbook, which is saved to filename.
+    # Saves to filename then only append the cells written since the last save to
+    # the journal file, and the workbook is written out in full on checkpoint() or
+    # when the program exits. If there's a journal left from a previous run that
+    # didn't get to checkpoint, e.g., due to a crash, its writes are replayed
+    def open_journal(self, filename):
+        self.snapshot = True
+        replay = []
+        if os.path.isfile(journal_filename(filename)):
+            if self.journal == None:
+                replay = read_journal(journal_filename(filename))
+            else:
+                # We just wrote out the file in full, so any journal left for it is stale
+                os.remove(journal_filename(filename))
+        if self.journal:
+            self.journal.close()
+        self.journal = None
+        self.journal_target = filename
+
+        self.replay_journal(replay)
+        self.journal = Journal(journal_filename(filename))
+        for t in self.snapshots.values():
+            t.journal = self.journal
+        if not self.journal_registered:
+            atexit.register(self.close_journal)
+            self.journal_registered = True
+
+    # Apply the entries read from a journal. If the database isn't journaling, the
+    # journal's filename is passed, so it can be removed once the workbook is written
+    # back to that file. Writes are applied to tables opened read only as well
+    def replay_journal(self, entries, filename=None):
+        if len(entries) == 0:
+            return
+        print("Replaying {} writes from journal {}".format(len(entries), journal_filename(filename or self.journal_target)))
+        self.replayed_journal = filename
+        tables = {}
+        for entry in entries:
+            if entry[0] == "create":
+                if entry[1] in self.table_names():
+                    continue
+                if self.read_only:
+                    # The read-only workbook can't have sheets added, so the table is only a snapshot
+                    self.sheet_names = self.table_names() + [entry[1]]
+                    table = self.add_snapshot(entry[1], SnapshotTable(None, None, columns=[], index={}, name=entry[1]))
+                    table.set_index(entry[2])
+                    table.read_only = True
+                else:
+                    self.create_table(entry[1], entry[2])
+                continue
+
+            # Non-snapshot tables are read from the sheet on each get_table, so we keep the one we write
+            if not entry[1] in tables:
+                tables[entry[1]] = self.get_table(entry[1])
+            table = tables[entry[1]]
+            read_only = isinstance(table, SnapshotTable) and table.read_only
+            if read_only:
+                table.read_only = False
+            if entry[0] == "value":
+                table.entry(entry[2], entry[3]).value = entry[4]
+            elif entry[0] == "style":
+                table.entry(entry[2], entry[3]).style = entry[4]
+            if read_only:
+                table.read_only = True
+
+    # Write out the workbook with all journaled writes and clear the journal
+    def checkpoint(self):
+        if not self.journal or (not self.journal.has_entries() and len(self.journal.pending) == 0):
+            return
+        self.write_workbook(self.journal_target)
+        self.journal.clear()
+
+    def close_journal(self):
+        if not self.journal:
+            return
+        # Only compact writes that were saved, the rest stay out of the workbook
+        # like they would without a journal
+        if len(self.journal.pending) == 0:
+            self.checkpoint()
+        else:
+            print("Discarding {} unsaved writes to {}".format(len(self.journal.pending), self.journal_target))
+            self.journal.pending = []
+            if self.journal.has_entries():
+                print("Saved writes to {} remain in journal {}".format(self.journal_target, self.journal.filename))
+        self.journal.close()
+        self.journal = None
+
+    # Snapshot all the sheets and write them to the workbook's sheet cache
+    def save_sheet_cache(self, filename):
+        sheets = {}
+        for name in self.table_names():
+            table = self.get_table(name, snapshot=True)
+            sheets[name] = {
+                "columns": table.columns,
+                "index": table.index
+            }
+        cache_file = sheet_cache_filename(filename)
+        try:
+            with io.open(cache_file + ".tmp", "wb") as f:
+                f.write(json.dumps(sheet_cache_key(filename)).encode("utf8") + b"\n")
+                pickle.dump(sheets, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(cache_file + ".tmp", cache_file)
+        except OSError as e:
+            print("Failed to write sheet cache {}: {}".format(cache_file, e))
+
+    # Get a sheet (or "table"). If snapshot is not specified the mode
+    # the database was opened with is used
+    def get_table(self, table_name, snapshot=None):
+        if snapshot == None or self.read_only or self.cache or self.journal_target != None:
+            snapshot = self.snapshot
+        if snapshot:
+            # Share the snapshot so all users of the sheet see the same data
+            if not table_name in self.snapshots:
+                sheet = self.workbook()[table_name]
+                if self.read_only:
+                    # The dimensions recorded in the file may be stale, so read all rows
+                    sheet.reset_dimensions()
+                self.add_snapshot(table_name, SnapshotTable(self.db, sheet, read_only=self.read_only))
+            return self.snapshots[table_name]
 
-    # Get a sheet (or "table")
-    def get_table(self, table_name):
         table = ExcelTable(self.db, self.db[table_name])
         table.load_index()
         return table
 
     def create_table(self, table, index):
-        table = ExcelTable(self.db, self.db.create_sheet(title=table))
+        if self.read_only:
+            raise ReadOnlyError("Cannot create table {} in a workbook opened read only".format(table))
+        self.workbook()
+        if self.sheet_names != None:
+            self.sheet_names.append(table)
+        if self.journal:
+            self.journal.record(("create", table, index))
+        if self.snapshot:
+            table = self.add_snapshot(table, SnapshotTable(self.db, self.db.create_sheet(title=table)))
+        else:
+            table = ExcelTable(self.db, self.db.create_sheet(title=table))
         table.set_index(index)
         return table
 
     def table_names(self):
+        if self.sheet_names != None:
+            return list(self.sheet_names)
         return self.db.get_sheet_names()
 
+    # Release the workbook file, which the read-only reader keeps open
+    def close(self):
+        if self.db != None:
+            self.db.close()
+
 class ExcelTable:
     def __init__(self, db, table):
         self.db = db
         self.table = table
+        # Columns with a lookup index (see add_lookup), and the value -> rows
+        # index for those we've built so far
+        self.lookup_attribs = set()
+        self.lookup_columns = set()
+        self.lookups = {}
+        # The number of writes made through the table, see version
+        self.writes = 0
 
-    # Index should be an array of column names in the order desired 
+    # Index should be an array of column names in the order desired
     def set_index(self, index):
         header_style = "40 % - Accent1"
         self.index = {}
@@ -44,6 +404,7 @@ class ExcelTable:
             self.index[name] = col + 1
             self.entry(1, col + 1).value = name
             self.entry(1, col + 1).style = header_style
+        self.reset_lookups()
 
     def load_index(self):
         self.index = {}
@@ -52,51 +413,481 @@ class ExcelTable:
             if not c[0].value:
                 continue
             self.index[c[0].value] = c[0].column
+        self.reset_lookups()
+
+    def max_row(self):
+        return self.table.max_row
 
     def entry(self, row, col):
         if type(col) is int:
-            return self.table.cell(row, col)
+            return TableCell(self, self.table.cell(row, col))
         return self.entry(row, self.index[col])
 
+    # Get a value that changes whenever the table is written, so callers can
+    # cheaply tell if the table changed since they last read it
+    def version(self):
+        return self.writes
+
+    # Iterate the (row, value) pairs of the entries in a column, skipping the header
+    def scan_column(self, col):
+        for r in self.table.iter_rows(min_row=2, min_col=col, max_col=col):
+            yield r[0].row, r[0].value
+
+    # Keep a hash index of the values in the column so that find on it doesn't
+    # have to scan the sheet. The index is built on the first find and kept up
+    # to date by writes made through the table
+    def add_lookup(self, attrib):
+        self.lookup_attribs.add(attrib)
+        self.reset_lookups()
+
+    def reset_lookups(self):
+        self.lookup_columns = set([self.index[a] for a in self.lookup_attribs if a in self.index])
+        self.lookups = {}
+
+    def lookup(self, col):
+        if not col in self.lookups:
+            lookup = {}
+            for r, v in self.scan_column(col):
+                if v != None:
+                    lookup.setdefault(v, []).append(r)
+            self.lookups[col] = lookup
+        return self.lookups[col]
+
+    # Update the lookup index for the column after the entry at row was changed
+    def update_lookup(self, row, col, old_value, new_value):
+        if row < 2 or not col in self.lookups or old_value == new_value:
+            return
+        lookup = self.lookups[col]
+        if old_value != None:
+            lookup[old_value].remove(row)
+            if len(lookup[old_value]) == 0:
+                del lookup[old_value]
+        if new_value != None:
+            insort(lookup.setdefault(new_value, []), row)
+
     # Find all rows with attribute matching value
     def find(self, attrib, value):
-        found = []
         col = self.index[attrib]
-        for r in self.table.iter_rows(min_row=2, min_col=col, max_col=col):
-            if r[0].value == value:
-                found.append(r[0].row)
-        return found
+        if col in self.lookup_columns and value != None:
+            return list(self.lookup(col).get(value, []))
+        return [r for r, v in self.scan_column(col) if v == value]
+
+    # Get the values of the entries in a column, where values[i] is the entry on row i + 2
+    def column_values(self, col):
+        return [v for r, v in self.scan_column(col)]
+
+    # Find all rows matching the query, built from Columns, e.g.,
+    # table.query((Column("Event") == "BREAK") | Column("Session").is_null())
+    def query(self, where):
+        return [i + 2 for i in sorted(where.matches(QueryContext(self), None))]
+
+    # Get the values of the columns for each row matching the query, or all rows
+    # if there's no query, as a list of (row, (values...))
+    def select(self, columns, where=None):
+        context = QueryContext(self)
+        if where == None:
+            found = range(self.max_row() - 1)
+        else:
+            found = sorted(where.matches(context, None))
+        values = [context.values(Column(c)) for c in columns]
+        return [(i + 2, tuple([v[i] for v in values])) for i in found]
 
     # Find all rows where the function returns true. The function
     # is passed the row being evaluated
     def find_if(self, fcn):
         found = []
-        for r in range(2, self.table.max_row + 1):
+        for r in range(2, self.max_row() + 1):
             if fcn(self.row(r)):
                 found.append(r)
         return found
 
     def row(self, row):
-        data = {}
-        for k, v in self.index.items():
-            data[k] = self.entry(row, v)
-        return data
+        return RowView(self, row)
 
     def items(self):
-        items = []
-        for r in range(2, self.table.max_row + 1):
-            items.append(self.row(r))
-        return items
+        for r in range(2, self.max_row() + 1):
+            yield RowView(self, r)
 
     def write_row(self, row, data):
         for k, v in data.items():
-            self.entry(row, self.index[k]).value = v
+            self.set_value(row, self.index[k], v)
+
+    def set_value(self, row, col, value):
+        cell = self.table.cell(row, col)
+        old_value = cell.value
+        cell.value = value
+        self.writes += 1
+        self.update_lookup(row, col, old_value, value)
+
+    # Write a dict of {row: data} into the database, where each data
+    # is a dict of {column: value} as passed to write_row
+    def write_rows(self, rows):
+        index = self.index
+        for row, data in rows.items():
+            for k, v in data.items():
+                self.set_value(row, index[k], v)
+
+    # Write the value into the column on each of the rows
+    def fill_column(self, rows, column, value):
+        col = column if type(column) is int else self.index[column]
+        for row in rows:
+            self.set_value(row, col, value)
 
     # Append a dict of data into the database, mapping the keys
     # to the corresponding output column
     def append_row(self, data):
-        row_array = [None] * len(self.index)
-        for k, v in data.items():
-            row_array[self.index[k] - 1] = v
-        self.table.append(row_array)
-        return self.table.max_row
+        return self.append_rows([data])[0]
+
+    # Append each dict of data in rows, returning the rows they were written to
+    def append_rows(self, rows):
+        index = self.index
+        appended = []
+        for data in rows:
+            row_array = [None] * len(index)
+            for k, v in data.items():
+                row_array[index[k] - 1] = v
+            self.table.append(row_array)
+            self.writes += 1
+            row = self.table.max_row
+            for col in self.lookups:
+                self.update_lookup(row, col, None, row_array[col - 1] if col <= len(row_array) else None)
+            appended.append(row)
+        return appended
+
+# A table whose sheet is read once into per-column arrays of values, instead of
+# going through the openpyxl cells on each access. Cells written through the table
+# are tracked and written back to the sheet when the database is saved.
+class SnapshotTable(ExcelTable):
+    # The columns and index can be passed to restore a snapshot without
+    # reading the sheet, e.g., from the sheet cache
+    def __init__(self, db, table, read_only=False, columns=None, index=None, name=None):
+        super().__init__(db, table)
+        self.read_only = read_only
+        self.name = name if name != None else table.title
+        # The ExcelDb's journal, if it's journaling writes
+        self.journal = None
+        # columns[col - 1][row - 1] is the value of the cell at (row, col)
+        if columns == None:
+            columns = [list(c) for c in zip_longest(*table.iter_rows(values_only=True))]
+        self.columns = columns
+        self.num_rows = len(self.columns[0]) if self.columns else 0
+        self.modified = set()
+        self.styles = {}
+        if index == None:
+            self.load_index()
+        else:
+            self.index = index
+            self.reset_lookups()
+
+    def load_index(self):
+        self.index = {}
+        for col, c in enumerate(self.columns):
+            # Skip empty columns
+            if not c[0]:
+                continue
+            self.index[c[0]] = col + 1
+        self.reset_lookups()
+
+    def max_row(self):
+        return self.num_rows
+
+    def entry(self, row, col):
+        if type(col) is int:
+            return SnapshotCell(self, row, col)
+        return SnapshotCell(self, row, self.index[col])
+
+    def get_value(self, row, col):
+        if col > len(self.columns) or row > self.num_rows:
+            return None
+        return self.columns[col - 1][row - 1]
+
+    def set_value(self, row, col, value):
+        if self.read_only:
+            raise ReadOnlyError("Cannot write {} to ({}, {}) in a table opened read only".format(value, row, col))
+        self.reserve(row, col)
+        self.writes += 1
+        self.update_lookup(row, col, self.columns[col - 1][row - 1], value)
+        self.columns[col - 1][row - 1] = value
+        self.modified.add((row, col))
+        if self.journal:
+            self.journal.record(("value", self.name, row, col, value))
+
+    def set_style(self, row, col, style):
+        if self.read_only:
+            raise ReadOnlyError("Cannot style ({}, {}) in a table opened read only".format(row, col))
+        self.styles[(row, col)] = style
+        if self.journal:
+            self.journal.record(("style", self.name, row, col, style))
+
+    # Grow the column arrays to hold the cell at (row, col)
+    def reserve(self, row, col):
+        while len(self.columns) < col:
+            self.columns.append([None] * self.num_rows)
+        if row > self.num_rows:
+            for c in self.columns:
+                c.extend([None] * (row - self.num_rows))
+            self.num_rows = row
+
+    def scan_column(self, col):
+        column = self.columns[col - 1]
+        for r in range(1, self.num_rows):
+            yield r + 1, column[r]
+
+    def column_values(self, col):
+        if col > len(self.columns):
+            return [None] * (self.num_rows - 1)
+        return self.columns[col - 1][1:]
+
+    def append_rows(self, rows):
+        if self.read_only:
+            raise ReadOnlyError("Cannot append a row to a table opened read only")
+        rows = list(rows)
+        first_row = self.num_rows + 1
+        self.reserve(self.num_rows + len(rows), len(self.index))
+        self.write_rows(dict(zip(range(first_row, first_row + len(rows)), rows)))
+        return list(range(first_row, first_row + len(rows)))
+
+    # Write the modified cells back to the sheet
+    def flush(self):
+        for row, col in sorted(self.modified):
+            self.table.cell(row, col).value = self.columns[col - 1][row - 1]
+        for (row, col), style in self.styles.items():
+            self.table.cell(row, col).style = style
+        self.modified = set()
+        self.styles = {}
+
+# Stands in for the openpyxl Cell of a SnapshotTable entry, so existing
+# code reading and writing entry(row, col).value works on both tables
+class SnapshotCell:
+    __slots__ = ("snapshot", "row", "column")
+
+    def __init__(self, snapshot, row, column):
+        self.snapshot = snapshot
+        self.row = row
+        self.column = column
+
+    @property
+    def value(self):
+        return self.snapshot.get_value(self.row, self.column)
+
+    @value.setter
+    def value(self, value):
+        self.snapshot.set_value(self.row, self.column, value)
+
+    @property
+    def style(self):
+        if (self.row, self.column) in self.snapshot.styles:
+            return self.snapshot.styles[(self.row, self.column)]
+        if self.snapshot.table == None:
+            return None
+        return self.snapshot.table.cell(self.row, self.column).style
+
+    @style.setter
+    def style(self, style):
+        self.snapshot.set_style(self.row, self.column, style)
+
+# A row of a table, accessed like a dict of {column: entry}. The entries
+# are looked up from the table's index when accessed
+class RowView:
+    __slots__ = ("table", "row")
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    def __getitem__(self, column):
+        return self.table.entry(self.row, self.table.index[column])
+
+    def get(self, column, default=None):
+        if not column in self.table.index:
+            return default
+        return self[column]
+
+    def __contains__(self, column):
+        return column in self.table.index
+
+    def __iter__(self):
+        return iter(self.table.index)
+
+    def __len__(self):
+        return len(self.table.index)
+
+    def keys(self):
+        return self.table.index.keys()
+
+    def values(self):
+        for col in self.table.index.values():
+            yield self.table.entry(self.row, col)
+
+    def items(self):
+        for k, col in self.table.index.items():
+            yield k, self.table.entry(self.row, col)
+
+    def __repr__(self):
+        return "RowView({}, {})".format(self.row, dict([(k, v.value) for k, v in self.items()]))
+
+# Wraps the openpyxl Cell of an entry, so writes to its value go through the
+# table to keep its lookup indexes and version up to date
+class TableCell:
+    __slots__ = ("table", "cell")
+
+    def __init__(self, table, cell):
+        object.__setattr__(self, "table", table)
+        object.__setattr__(self, "cell", cell)
+
+    @property
+    def value(self):
+        return self.cell.value
+
+    @value.setter
+    def value(self, value):
+        self.table.set_value(self.cell.row, self.cell.column, value)
+
+    def __getattr__(self, name):
+        return getattr(self.cell, name)
+
+    def __setattr__(self, name, value):
+        if name == "value":
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.cell, name, value)
+
+# The column values read by the parts of a query, so each column is only read once
+class QueryContext:
+    def __init__(self, table):
+        self.table = table
+        self.num_rows = max(table.max_row() - 1, 0)
+        self.columns = {}
+
+    def values(self, column):
+        if not (column.name, column.key) in self.columns:
+            values = self.table.column_values(self.table.index[column.name])
+            if column.key:
+                values = [column.key(v) for v in values]
+            self.columns[(column.name, column.key)] = values
+        return self.columns[(column.name, column.key)]
+
+# Queries on a table are built from its columns, and combined with &, | and ~.
+# A query evaluates to the set of matching rows, stored as row - 2
+class Query:
+    def __and__(self, other):
+        return AllOf([self, other])
+
+    def __or__(self, other):
+        return AnyOf([self, other])
+
+    def __invert__(self):
+        return NoneOf(self)
+
+    # Get the set of candidates (or all rows if candidates is None) matching the query
+    def matches(self, context, candidates):
+        raise NotImplementedError
+
+class Column:
+    # The key function, if any, is applied to the column values before comparing them
+    def __init__(self, name, key=None):
+        self.name = name
+        self.key = key
+
+    # Compare the result of fcn(value) for each value in the column
+    def map(self, fcn):
+        if self.key:
+            return Column(self.name, key=lambda v, key=self.key: fcn(key(v)))
+        return Column(self.name, key=fcn)
+
+    def __eq__(self, value):
+        return Equals(self, value)
+
+    def __ne__(self, value):
+        return NoneOf(Equals(self, value))
+
+    def __lt__(self, value):
+        return Compare(self, lambda v: v != None and v < value)
+
+    def __le__(self, value):
+        return Compare(self, lambda v: v != None and v <= value)
+
+    def __gt__(self, value):
+        return Compare(self, lambda v: v != None and v > value)
+
+    def __ge__(self, value):
+        return Compare(self, lambda v: v != None and v >= value)
+
+    # Values in the inclusive range [low, high]
+    def between(self, low, high):
+        return Compare(self, lambda v: v != None and low <= v and v <= high)
+
+    def isin(self, values):
+        values = set(values)
+        return Compare(self, lambda v: v in values)
+
+    def is_null(self):
+        return Compare(self, lambda v: v == None)
+
+    def not_null(self):
+        return Compare(self, lambda v: v != None)
+
+class Compare(Query):
+    def __init__(self, column, test):
+        self.column = column
+        self.test = test
+
+    def matches(self, context, candidates):
+        values = context.values(self.column)
+        if candidates == None:
+            candidates = range(len(values))
+        test = self.test
+        return set([i for i in candidates if test(values[i])])
+
+class Equals(Compare):
+    def __init__(self, column, value):
+        super().__init__(column, lambda v: v == value)
+        self.value = value
+
+    def matches(self, context, candidates):
+        # Use the table's lookup index for the column if it has one
+        table = context.table
+        if not self.column.key and self.value != None and self.column.name in table.index \
+                and table.index[self.column.name] in table.lookup_columns:
+            found = set([r - 2 for r in table.find(self.column.name, self.value)])
+            if candidates == None:
+                return found
+            return found.intersection(candidates)
+        return super().matches(context, candidates)
+
+class AllOf(Query):
+    def __init__(self, queries):
+        self.queries = queries
+
+    def __and__(self, other):
+        return AllOf(self.queries + [other])
+
+    def matches(self, context, candidates):
+        # Each query only has to check the rows matching the ones before it
+        for q in self.queries:
+            candidates = q.matches(context, candidates)
+            if len(candidates) == 0:
+                break
+        return candidates
+
+class AnyOf(Query):
+    def __init__(self, queries):
+        self.queries = queries
+
+    def __or__(self, other):
+        return AnyOf(self.queries + [other])
+
+    def matches(self, context, candidates):
+        found = set()
+        for q in self.queries:
+            found |= q.matches(context, candidates)
+        return found
+
+class NoneOf(Query):
+    def __init__(self, query):
+        self.query = query
+
+    def matches(self, context, candidates):
+        if candidates == None:
+            candidates = range(context.num_rows)
+        return set(candidates) - self.query.matches(context, candidates)
@@ -0,0 +1,74 @@
+import threading
+import concurrent.futures
+
+# The default number of sessions provisioned at once
+PROVISION_WORKERS = 8
+
+# The default number of requests made to each service at once, across all sessions
+SERVICE_LIMITS = {
+    "thumbnail": 4,
+    "youtube": 4,
+    "zoom": 2
+}
+
+# The sheet entries created for a session by provision_sessions. If provisioning
+# failed part way, entries has what was created before the error
+class ProvisionedSession:
+    __slots__ = ("session", "computer", "entries", "error")
+
+    def __init__(self, session, computer):
+        self.session = session
+        self.computer = computer
+        self.entries = {"Computer": computer}
+        self.error = None
+
+# Create the YouTube broadcast (with its thumbnail) and Zoom meeting for the session,
+# filling in the entries of the provisioned session without writing them to the sheet.
+# The Zoom meeting is created after the broadcast so its agenda has the Youtube URL.
+# The broadcast or meeting created for the session by an earlier run that failed part
+# way is kept
+def provision_session(provisioned, thumbnail_params, limits):
+    session = provisioned.session
+    if session.timeslot_entry(0, "Time Slot Type").value != "Zoom Only" and \
+            not session.timeslot_entry(0, "Youtube Broadcast").value:
+        with limits["thumbnail"]:
+            thumbnail_img = session.render_thumbnail(thumbnail_params)
+        with limits["youtube"]:
+            provisioned.entries.update(session.create_youtube_broadcast(thumbnail_img))
+    if not session.timeslot_entry(0, "Zoom Meeting ID").value:
+        with limits["zoom"]:
+            provisioned.entries.update(session.create_zoom_meeting(provisioned.computer,
+                provisioned.entries.get("Youtube Broadcast")))
+
+# Provision the scheduled sessions (from computer_schedule) on a pool of workers, with
+# at most service_limits requests made to each service at once. Returns the
+# provisioned sessions in the order passed, their entries are written to the sheet
+# by commit_provisioned
+def provision_sessions(scheduled_sessions, thumbnail_params, workers=PROVISION_WORKERS,
+        service_limits=SERVICE_LIMITS):
+    limits = {service: threading.BoundedSemaphore(n) for service, n in service_limits.items()}
+    provisioned = [ProvisionedSession(s.session, s.computer) for s in scheduled_sessions]
+
+    def provision(p):
+        try:
+            provision_session(p, thumbnail_params, limits)
+        except Exception as e:
+            p.error = e
+            print("Failed to provision {}: {}".format(p.session.event_session_title(), e))
+            return
+        print("Provisioned {} on computer {}".format(p.session.event_session_title(), p.computer))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(provision, provisioned))
+    return provisioned
+
+# Write the entries of the provisioned sessions to their day sheets in one batch per sheet,
+# including those of sessions that failed part way so the items created are kept track of
+def commit_provisioned(provisioned):
+    day_rows = {}
+    for p in provisioned:
+        rows = day_rows.setdefault(p.session.day, {})
+        for t in p.session.timeslots:
+            rows[t] = p.entries
+    for day, rows in day_rows.items():
+        day.sheet.write_rows(rows)
@@ -9,6 +9,8 @@ import secrets
 import base64
 import discord
 import ics
+import bisect
+import functools
 
 from email import encoders
 from email.mime.text import MIMEText
@@ -19,6 +21,7 @@ from datetime import timezone, datetime, timedelta
 from googleapiclient.http import MediaIoBaseUpload
 
 import core.excel_db as excel_db
+import core.sqlite_db as sqlite_db
 import core.auth as conf_auth
 import core.thumbnail as thumbnail
 
@@ -34,9 +37,21 @@ CONFERENCE_LOGO_URL = "https://i.imgur.com/amRNJoR.png"
 # See the image at the URL for an example
 CONFERENCE_ICON_URL = "https://i.imgur.com/amRNJoR.png"
 CONFERENCE_YEAR = 2020
+# The day sheets of the conference
+CONFERENCE_DAYS = ["sunday", "monday", "tuesday", "wednesday", "thursday", "friday"]
+# The most IDs the YouTube API list requests accept at once
+YOUTUBE_MAX_LIST_IDS = 50
+
+# The day sheet columns which can be searched over all days with Database.find
+DATABASE_INDEX_COLUMNS = ["Session ID", "UID", "Event Prefix", "Computer"]
 
 match_timeslot = re.compile("(\d\d)(\d\d)-(\d\d)(\d\d)")
 
+# The day sheet columns written by a Session when scheduling or streaming it. A SessionRecord
+# reads these through the sheet, and all other columns from the values read with the record
+SESSION_WRITE_COLUMNS = ["Computer", "Youtube Broadcast", "Youtube Control Room", "Youtube Chat ID",
+        "Zoom URL", "Zoom Meeting ID", "Zoom Password", "Discord Channel", "Discord Link", "Discord Invite Link"]
+
 # Parse the HHMM-HHMM start-end info for a time slot into a datetime
 def parse_time_slot(time_slot, month, day):
     m = match_timeslot.match(time_slot)
@@ -53,6 +68,27 @@ def format_time(time):
 def format_time_iso8601_utc(time):
     return time.astimezone(tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
+# Load the JSON file kept next to the schedule, or None if it's missing or can't be read
+def load_json_file(filename):
+    if not os.path.isfile(filename):
+        return None
+    try:
+        with open(filename, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print("Failed to read {}: {}".format(filename, e))
+        return None
+
+# Write the data to a JSON file kept next to the schedule. It's written to a temp file
+# that replaces the file, so it's never left partly written
+def save_json_file(filename, data):
+    try:
+        with open(filename + ".tmp", "w") as f:
+            json.dump(data, f)
+        os.replace(filename + ".tmp", filename)
+    except OSError as e:
+        print("Failed to write {}: {}".format(filename, e))
+
 def generate_password():
     alphabet = string.ascii_letters + string.digits
     return ''.join(secrets.choice(alphabet) for i in range(8))
@@ -145,42 +181,172 @@ def send_html_email(subject, body, recipients, email, cc_recipients=None, attach
     print(response)
 
 class Database:
-    def __init__(self, workbook_name, youtube=False, email=False, use_pickled_credentials=False):
-        self.workbook = excel_db.open(workbook_name)
+    def __init__(self, workbook_name, youtube=False, email=False, use_pickled_credentials=False, snapshot=False,
+            read_only=False, cache=False, journal=False):
+        # The schedule can also be kept in an SQLite database, see core/sqlite_db.py
+        if os.path.splitext(workbook_name)[1] in [".db", ".sqlite"]:
+            self.workbook = sqlite_db.open(workbook_name, read_only=read_only)
+        else:
+            self.workbook = excel_db.open(workbook_name, snapshot=snapshot, read_only=read_only, cache=cache, journal=journal)
         if youtube or email:
             self.auth = conf_auth.Authentication(youtube=youtube, email=email, use_pickled_credentials=use_pickled_credentials)
         else:
             self.auth = None
 
+        self.workbook_name = workbook_name
         self.computers = self.workbook.get_table("computers")
+        self.computers.add_lookup("ID")
+        self.intervals = None
+        self.days = {}
+        self.indexed_days = None
 
+    # Days are kept so the lookups on their sheets are kept up to date by writes to them
     def get_day(self, day):
-        return Day(self, self.workbook.get_table(day))
+        if not day in self.days:
+            self.days[day] = Day(self, self.workbook.get_table(day))
+        return self.days[day]
+
+    # Get the days of the conference, with lookups on the DATABASE_INDEX_COLUMNS of their sheets
+    def index_days(self):
+        if self.indexed_days == None:
+            table_names = self.workbook.table_names()
+            self.indexed_days = [self.get_day(d) for d in CONFERENCE_DAYS if d in table_names]
+            for d in self.indexed_days:
+                for c in DATABASE_INDEX_COLUMNS:
+                    if c in d.sheet.index:
+                        d.sheet.add_lookup(c)
+        return self.indexed_days
+
+    # Find the rows with the value in one of the DATABASE_INDEX_COLUMNS over all days,
+    # returned as a list of (day, rows)
+    def find(self, column, value):
+        found = []
+        for d in self.index_days():
+            if column in d.sheet.index:
+                rows = d.sheet.find(column, value)
+                if len(rows) > 0:
+                    found.append((d, rows))
+        return found
+
+    # Find the sessions with time slots with the value in one of the DATABASE_INDEX_COLUMNS,
+    # e.g., database.find_sessions("Session ID", session_id)
+    def find_sessions(self, column, value):
+        sessions = []
+        for d, rows in self.find(column, value):
+            day_sessions = {}
+            for r in rows:
+                event = d.entry(r, "Event").value
+                name = d.entry(r, "Session").value
+                if not (event, name) in day_sessions:
+                    day_sessions[(event, name)] = Session(event, name, d)
+                    sessions.append(day_sessions[(event, name)])
+                day_sessions[(event, name)].timeslots.append(r)
+        return sessions
 
     def save(self, output):
         self.workbook.save(output)
 
+    # Get the SessionIntervals index of the sessions over all days of the conference
+    def session_intervals(self):
+        if self.intervals == None:
+            sessions = []
+            table_names = self.workbook.table_names()
+            for d in CONFERENCE_DAYS:
+                if d in table_names:
+                    sessions += list(self.get_day(d).get_sessions(False, records=True).values())
+            self.intervals = SessionIntervals(sessions)
+        return self.intervals
+
+    # If the database is journaled, write out the journaled changes to the workbook
+    def checkpoint(self):
+        self.workbook.checkpoint()
+
     # Lookup the youtube stream key IDs for each computer and fill in
-    # the sheet. Note that these are not the same as the stream keys
+    # the sheet. Note that these are not the same as the stream keys.
+    # The {stream key: stream key ID} found are kept in a file next to the workbook,
+    # and are only looked up again if a computer has a stream key that isn't in it
     def populate_stream_key_ids(self):
-        # Note: if more than 50 stream keys in the account, have to request multiple
-        # pages of results using the page tokens
-        live_streams = self.auth.youtube.liveStreams().list(
-            part="id,snippet,cdn,status",
-            mine=True,
-            maxResults=50).execute()
+        ids_file = self.workbook_name + ".stream_key_ids"
+        # The stream key IDs are looked up again if the file can't be read
+        stream_key_ids = load_json_file(ids_file)
+        if type(stream_key_ids) != dict:
+            stream_key_ids = {}
+
+        stream_keys = [c["Youtube Stream Key"].value for c in self.computers.items() if c["Youtube Stream Key"].value]
+        if any([not k in stream_key_ids for k in stream_keys]):
+            stream_key_ids = {}
+            request = self.auth.youtube.liveStreams().list(
+                part="id,cdn",
+                mine=True,
+                maxResults=50)
+            while request != None:
+                live_streams = request.execute()
+                for s in live_streams["items"]:
+                    stream_key_ids[s["cdn"]["ingestionInfo"]["streamName"]] = s["id"]
+                request = self.auth.youtube.liveStreams().list_next(request, live_streams)
+            save_json_file(ids_file, stream_key_ids)
+
+        # Only IDs that changed are written, so opening an SQLite schedule doesn't write to it
         for c in self.computers.items():
-            for s in live_streams["items"]:
-                if c["Youtube Stream Key"].value == s["cdn"]["ingestionInfo"]["streamName"]:
-                    c["Youtube Stream Key ID"].value = s["id"]
+            stream_key_id = stream_key_ids.get(c["Youtube Stream Key"].value)
+            if stream_key_id != None and c["Youtube Stream Key ID"].value != stream_key_id:
+                c["Youtube Stream Key ID"].value = stream_key_id
+
+    # Get the {Zoom Meeting ID: time slot} of the times the sessions' Zoom meetings and
+    # Youtube broadcasts were last scheduled for, kept in <workbook>.scheduled_times
+    def load_scheduled_times(self):
+        scheduled_times = load_json_file(self.workbook_name + ".scheduled_times")
+        return scheduled_times if type(scheduled_times) == dict else {}
+
+    # Record the times of the sessions passed as the times their Zoom meetings
+    # and Youtube broadcasts are scheduled for
+    def save_scheduled_times(self, sessions):
+        scheduled_times = self.load_scheduled_times()
+        for v in sessions:
+            meeting_id = v.timeslot_entry(0, "Zoom Meeting ID").value
+            if meeting_id:
+                scheduled_times[str(meeting_id)] = format_time_slot(*v.session_time())
+        save_json_file(self.workbook_name + ".scheduled_times", scheduled_times)
 
     def get_computer(self, computer_id):
-        return [c for c in self.computers.items() if c["ID"].value == computer_id][0]
+        return self.computers.row(self.computers.find("ID", computer_id)[0])
+
+    # List the YouTube resources with the IDs passed, making one request for each
+    # YOUTUBE_MAX_LIST_IDS IDs. Returns a dict of the items listed keyed by their ID,
+    # IDs that YouTube doesn't find are left out. maxResults isn't passed since it
+    # can't be used with id, each request returns at most the IDs it lists
+    def list_youtube_items(self, resource, ids, part):
+        ids = list(dict.fromkeys(i for i in ids if i))
+        items = {}
+        for i in range(0, len(ids), YOUTUBE_MAX_LIST_IDS):
+            response = resource().list(
+                id=",".join(ids[i:i + YOUTUBE_MAX_LIST_IDS]),
+                part=part
+            ).execute()
+            for item in response["items"]:
+                items[item["id"]] = item
+        return items
+
+    # Get the (stream status, health status) of the stream key IDs
+    def get_stream_statuses(self, stream_key_ids):
+        streams = self.list_youtube_items(self.auth.youtube.liveStreams, stream_key_ids, "status")
+        return {k: (s["status"]["streamStatus"], s["status"]["healthStatus"]["status"]) for k, s in streams.items()}
+
+    # Get the life cycle status of the broadcast IDs
+    def get_broadcast_statuses(self, broadcast_ids):
+        broadcasts = self.list_youtube_items(self.auth.youtube.liveBroadcasts, broadcast_ids, "status")
+        return {k: b["status"]["lifeCycleStatus"] for k, b in broadcasts.items()}
+
+    # Get the live streaming details (e.g., concurrent viewers) of the broadcast IDs
+    def get_broadcast_statistics(self, broadcast_ids):
+        videos = self.list_youtube_items(self.auth.youtube.videos, broadcast_ids, "liveStreamingDetails")
+        return {k: v["liveStreamingDetails"] for k, v in videos.items()}
 
 class Day:
     def __init__(self, database, sheet):
         self.database = database
         self.sheet = sheet
+        self.intervals = None
 
         # Get the month and day from the sheet
         match_day = re.compile("\w+ (\d+)/(\d+)")
@@ -191,29 +357,95 @@ class Day:
     def entry(self, row, item):
         return self.sheet.entry(row, item)
 
-    def get_sessions(self, include_breaks):
+    # Get the sessions on this day. If records is set the sessions are
+    # SessionRecords, read in one pass over the sheet
+    def get_sessions(self, include_breaks, records=False):
+        session_rows = excel_db.Column("Event").not_null()
+        if not include_breaks:
+            session_rows = session_rows & (excel_db.Column("Event") != "BREAK")
+
         # Session information starts on row 3
+        columns = ["Event", "Session"]
+        if records:
+            columns = list(self.sheet.index)
+        column_index = dict([(c, i) for i, c in enumerate(columns)])
+
         sessions = {}
-        for r in range(3, self.sheet.table.max_row + 1):
-            event_name = self.entry(r, "Event").value
-            session_name = self.entry(r, "Session").value
-            if not include_breaks and event_name == "BREAK":
-                continue
-            if event_name == None:
+        for r, values in self.sheet.select(columns, session_rows):
+            if r < 3:
                 continue
+            event_name = values[column_index["Event"]]
+            session_name = values[column_index["Session"]]
             session_key = event_name + "-" + session_name
             if not session_key in sessions:
-                sessions[session_key] = Session(event_name, session_name, self)
-            sessions[session_key].timeslots.append(r)
+                if records:
+                    sessions[session_key] = SessionRecord(event_name, session_name, self, column_index)
+                else:
+                    sessions[session_key] = Session(event_name, session_name, self)
+            if records:
+                sessions[session_key].add_timeslot(r, values)
+            else:
+                sessions[session_key].timeslots.append(r)
         return sessions
 
+    # Get the SessionIntervals index of the sessions on this day
+    def session_intervals(self):
+        if self.intervals == None:
+            self.intervals = SessionIntervals(list(self.get_sessions(False, records=True).values()))
+        return self.intervals
+
+# An index of sessions by their start and end times, to find the sessions live at a
+# time or starting or ending in a time window without checking each session
+class SessionIntervals:
+    def __init__(self, sessions):
+        times = [s.session_time() for s in sessions]
+        by_start = sorted(range(len(sessions)), key=lambda i: times[i][0])
+        self.starts = [times[i][0] for i in by_start]
+        self.by_start = [sessions[i] for i in by_start]
+        by_end = sorted(range(len(sessions)), key=lambda i: times[i][1])
+        self.ends = [times[i][1] for i in by_end]
+        self.by_end = [sessions[i] for i in by_end]
+        # Sessions live at a time started at most the longest session length before it
+        self.max_length = max([end - start for start, end in times], default=timedelta(0))
+
+    # Get the sessions starting in the inclusive interval [start, end]
+    def starting_in(self, start, end):
+        return self.by_start[bisect.bisect_left(self.starts, start):bisect.bisect_right(self.starts, end)]
+
+    # Get the sessions ending in the inclusive interval [start, end]
+    def ending_in(self, start, end):
+        return self.by_end[bisect.bisect_left(self.ends, start):bisect.bisect_right(self.ends, end)]
+
+    # Get the sessions live at the time, i.e., start <= time <= end
+    def live_at(self, time):
+        return [s for s in self.starting_in(time - self.max_length, time) if s.session_time()[1] >= time]
+
+# Cache the text rendered by a Session method until the session's day sheet is written,
+# which is checked with the sheet's version so a cached render doesn't read the sheet.
+# Only methods rendering strings are cached, other results could be modified by callers
+def cached_render(fcn):
+    @functools.wraps(fcn)
+    def render(self, *args, **kwargs):
+        key = (fcn.__name__, args, tuple(sorted(kwargs.items())))
+        version = self.day.sheet.version()
+        cached = self.renders.get(key)
+        if cached == None or cached[0] != version:
+            cached = (version, fcn(self, *args, **kwargs))
+            self.renders[key] = cached
+        return cached[1]
+    return render
+
 class Session:
+    __slots__ = ("event", "name", "day", "auth", "timeslots", "renders")
+
     def __init__(self, event, name, day):
         self.event = event
         self.name = name
         self.day = day
         self.auth = day.database.auth
         self.timeslots = []
+        # The cached renders of the session, see cached_render
+        self.renders = {}
 
     def num_timeslots(self):
         return len(self.timeslots)
@@ -257,6 +489,32 @@ class Session:
             return timedelta(minutes=15)
         return timedelta(minutes=0)
 
+    def session_chairs(self):
+        chairs = set()
+        for t in range(self.num_timeslots()):
+            if self.timeslot_entry(t, "Chair(s)").value:
+                for c in self.timeslot_entry(t, "Chair(s)").value.split("|"):
+                    chairs.add(c)
+        return chairs
+
+    # Get the emails of the contributors, chairs and organizers of the session
+    def session_emails(self):
+        recipients = set()
+        for t in range(self.num_timeslots()):
+            emails = []
+            if self.timeslot_entry(t, "Contributor Email(s)").value:
+                emails = emails + self.timeslot_entry(t, "Contributor Email(s)").value.split("|")
+
+            if self.timeslot_entry(t, "Chair Email(s)").value:
+                emails = emails + self.timeslot_entry(t, "Chair Email(s)").value.split("|")
+
+            if self.timeslot_entry(t, "Organizer Email(s)").value:
+                emails = emails + self.timeslot_entry(t, "Organizer Email(s)").value.split("|")
+
+            for e in emails:
+                recipients.add(e)
+        return recipients
+
     def special_notes(self):
         notes = set()
         for t in range(0, len(self.timeslots)):
@@ -269,30 +527,31 @@ class Session:
                 notes.add("Uses custom title image")
         return notes
 
-    def get_stream_status(self):
+    # The stream key ID of the computer streaming the session, if it has one
+    def stream_key_id(self):
         computer = self.timeslot_entry(0, "Computer").value
-        stream_key = self.day.database.get_computer(computer)["Youtube Stream Key ID"].value
-        response = self.auth.youtube.liveStreams().list(
-            id=stream_key,
-            part="status"
-        ).execute()
-        return response["items"][0]["status"]["streamStatus"], response["items"][0]["status"]["healthStatus"]["status"]
+        if not computer:
+            return None
+        return self.day.database.get_computer(computer)["Youtube Stream Key ID"].value
+
+    # To get the status of many sessions at once use the Database
+    # get_stream_statuses, get_broadcast_statuses and get_broadcast_statistics.
+    # The stream status is (None, None) if the session has no computer or its
+    # stream isn't found, and the broadcast status and statistics are None if
+    # the broadcast isn't found
+    def get_stream_status(self):
+        stream_key = self.stream_key_id()
+        return self.day.database.get_stream_statuses([stream_key]).get(stream_key, (None, None))
 
     def get_broadcast_status(self):
-        response = self.auth.youtube.liveBroadcasts().list(
-            id=self.youtube_broadcast_id(),
-            part="status"
-        ).execute()
-        return response["items"][0]["status"]["lifeCycleStatus"]
+        return self.day.database.get_broadcast_statuses([self.youtube_broadcast_id()]).get(self.youtube_broadcast_id())
 
     def get_broadcast_statistics(self):
-        response = self.auth.youtube.videos().list(
-            id=self.youtube_broadcast_id(),
-            part="liveStreamingDetails"
-        ).execute()
-        return response["items"][0]["liveStreamingDetails"]
+        return self.day.database.get_broadcast_statistics([self.youtube_broadcast_id()]).get(self.youtube_broadcast_id())
 
-    def start_streaming(self):
+    # The stream and broadcast status can be passed in if they were already looked up
+    # for a batch of sessions, otherwise they're looked up for this session
+    def start_streaming(self, stream_status=None, broadcast_status=None):
         timeslot_type = self.timeslot_entry(0, "Time Slot Type").value
         if timeslot_type == "Zoom Only" or timeslot_type == "Discord Only":
             print("Not streaming Zoom/Discord only event")
@@ -307,8 +566,11 @@ class Session:
         stream_key = computer_info["Youtube Stream Key"].value
         stream_key_id = computer_info["Youtube Stream Key ID"].value
 
-        stream_status, stream_health = self.get_stream_status()
-        broadcast_status = self.get_broadcast_status()
+        if stream_status == None:
+            stream_status = self.get_stream_status()
+        stream_status, stream_health = stream_status
+        if broadcast_status == None:
+            broadcast_status = self.get_broadcast_status()
         # Broadcast could be in the ready state (configured and a stream key was bound),
         # or in the created state (configured but no stream key attached yet).
         if broadcast_status != "ready" and broadcast_status != "created":
@@ -339,7 +601,8 @@ class Session:
             part="status"
         ).execute()
 
-    def stop_streaming(self):
+    # The broadcast status can be passed in if it was already looked up
+    def stop_streaming(self, broadcast_status=None):
         timeslot_type = self.timeslot_entry(0, "Time Slot Type").value
         if timeslot_type == "Zoom Only" or timeslot_type == "Discord Only":
             print("No stream to stop for Zoom/Discord only event")
@@ -351,7 +614,8 @@ class Session:
                 self.event_session_title(), computer))
             return
 
-        broadcast_status = self.get_broadcast_status()
+        if broadcast_status == None:
+            broadcast_status = self.get_broadcast_status()
         if broadcast_status == "complete":
             print("Broadcast {} has already been made complete, skipping redundant transition".format(self.youtube_broadcast_id()))
             return
@@ -385,18 +649,38 @@ class Session:
             }
         ).execute()
 
-    # Create the virtual aspects of the session to be streamed by the specified computer
+    def assign_computer(self, computer):
+        self.day.sheet.fill_column(self.timeslots, "Computer", computer)
+
+    # Write the {column: value} entries to all time slots of the session
+    def write_entries(self, entries):
+        self.day.sheet.write_rows({t: entries for t in self.timeslots})
+
+    # Check if the session has all the virtual aspects create_virtual_session makes for it
+    def is_scheduled(self):
+        if not self.timeslot_entry(0, "Zoom Meeting ID").value:
+            return False
+        return self.timeslot_entry(0, "Time Slot Type").value == "Zoom Only" or \
+                self.timeslot_entry(0, "Youtube Broadcast").value != None
+
+    # Create the virtual aspects of the session to be streamed by the specified computer.
+    # Those created by an earlier run that failed part way are kept
     def create_virtual_session(self, computer, thumbnail_params):
-        for t in range(0, len(self.timeslots)):
-            self.timeslot_entry(t, "Computer").value = computer
-        if self.timeslot_entry(0, "Time Slot Type").value != "Zoom Only":
+        self.assign_computer(computer)
+        if self.timeslot_entry(0, "Time Slot Type").value != "Zoom Only" and \
+                not self.timeslot_entry(0, "Youtube Broadcast").value:
             self.schedule_youtube_broadcast(thumbnail_params)
-        self.schedule_zoom()
+        if not self.timeslot_entry(0, "Zoom Meeting ID").value:
+            self.schedule_zoom()
 
     # Schedule the Zoom meeting for the session and populate the sheet
     def schedule_zoom(self):
-        computer = self.timeslot_entry(0, "Computer").value
+        self.write_entries(self.create_zoom_meeting(self.timeslot_entry(0, "Computer").value))
 
+    # Create the Zoom meeting for the session hosted by the computer, returning the
+    # sheet entries for it. The youtube_url of the session's broadcast can be passed
+    # for the meeting agenda if it isn't in the sheet yet
+    def create_zoom_meeting(self, computer, youtube_url=None):
         # First get our user info (we'll just have 1 per-account I guess?)
         headers = self.auth.zoom
         r = requests.get("https://api.zoom.us/v2/users?status=active&page_size=30&page_number=1", headers=headers).json()
@@ -411,25 +695,22 @@ class Session:
             else:
                 alternative_hosts.append(user["id"])
 
-        session_time = self.session_time()
-        # Zoom meetings start 15min ahead of time to set up, and can run 10min over
-        zoom_start = session_time[0] - self.setup_time()
-        zoom_end = session_time[1] + timedelta(minutes=10)
+        zoom_start, zoom_duration = self.zoom_meeting_time()
         meeting_topic = CONFERENCE_NAME + ": " + self.event_session_title()
         # Max Zoom meeting topic length is 200 characters
         if len(meeting_topic) > 200:
             meeting_topic = meeting_topic[0:199]
         # Max agenda length is 2000 characters
-        meeting_agenda = str(self)
+        meeting_agenda = self.session_text(youtube_url)
         if len(meeting_agenda) > 2000:
             meeting_agenda = meeting_agenda[0:1999]
 
         meeting_info = {
             "topic": meeting_topic,
             "type": 2,
-            "start_time": zoom_start.astimezone(tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "start_time": zoom_start,
             "timezone": "UTC",
-            "duration": int((zoom_end - zoom_start).total_seconds() / 60.0),
+            "duration": zoom_duration,
             "password": generate_password(),
             "agenda": meeting_agenda,
             "settings": {
@@ -456,10 +737,68 @@ class Session:
         zoom_info = requests.post("https://api.zoom.us/v2/users/{}/meetings".format(host), json=meeting_info, headers=headers).json()
 
         # Fill in the Zoom info in the sheet
-        for t in range(0, len(self.timeslots)):
-            self.timeslot_entry(t, "Zoom URL").value = zoom_info["join_url"]
-            self.timeslot_entry(t, "Zoom Meeting ID").value = str(zoom_info["id"])
-            self.timeslot_entry(t, "Zoom Password").value = meeting_info["password"]
+        zoom_entries = {
+            "Zoom URL": zoom_info["join_url"],
+            "Zoom Meeting ID": str(zoom_info["id"]),
+            "Zoom Password": meeting_info["password"]
+        }
+        return zoom_entries
+
+    # Get the (UTC start time, duration in minutes) of the session's Zoom meeting
+    def zoom_meeting_time(self):
+        session_time = self.session_time()
+        # Zoom meetings start 15min ahead of time to set up, and can run 10min over
+        zoom_start = session_time[0] - self.setup_time()
+        zoom_end = session_time[1] + timedelta(minutes=10)
+        return (format_time_iso8601_utc(zoom_start), int((zoom_end - zoom_start).total_seconds() / 60.0))
+
+    # Get the (start, end) time the session's Zoom meeting and Youtube broadcast were scheduled
+    # for, from the scheduled_times (see Database.load_scheduled_times) or the Zoom meeting if the
+    # session isn't in them
+    def scheduled_time(self, scheduled_times):
+        meeting_id = str(self.timeslot_entry(0, "Zoom Meeting ID").value)
+        if meeting_id in scheduled_times:
+            return parse_time_slot(scheduled_times[meeting_id], self.day.month, self.day.day)
+        meeting_info = self.get_zoom_meeting_info()
+        zoom_start = datetime.strptime(meeting_info["start_time"], "%Y-%m-%dT%H:%M:%SZ") \
+                .replace(tzinfo=timezone.utc).astimezone(conf_tz)
+        # Undo the setup and overrun time added by zoom_meeting_time
+        return (zoom_start + self.setup_time(), zoom_start + timedelta(minutes=meeting_info["duration"] - 10))
+
+    # Move the session's Zoom meeting and Youtube broadcast (if it has one) to the session's
+    # time in the sheet, e.g., after its time slot was changed. Returns True if either was moved
+    def reschedule_virtual_session(self):
+        moved = False
+        zoom_start, zoom_duration = self.zoom_meeting_time()
+        meeting_info = self.get_zoom_meeting_info()
+        if meeting_info["start_time"] != zoom_start or meeting_info["duration"] != zoom_duration:
+            requests.patch("https://api.zoom.us/v2/meetings/{}".format(meeting_info["id"]),
+                    json={"start_time": zoom_start, "timezone": "UTC", "duration": zoom_duration},
+                    headers=self.auth.zoom).raise_for_status()
+            moved = True
+
+        if not self.timeslot_entry(0, "Youtube Broadcast").value:
+            return moved
+        start = format_time_iso8601_utc(self.session_time()[0])
+        broadcast = self.auth.youtube.liveBroadcasts().list(
+            id=self.youtube_broadcast_id(),
+            part="id,snippet"
+        ).execute()["items"][0]
+        if broadcast["snippet"]["scheduledStartTime"] != start:
+            # Updating the snippet replaces it, so the title and description are passed back
+            self.auth.youtube.liveBroadcasts().update(
+                part="id,snippet",
+                body={
+                    "id": broadcast["id"],
+                    "snippet": {
+                        "title": broadcast["snippet"]["title"],
+                        "description": broadcast["snippet"]["description"],
+                        "scheduledStartTime": start
+                    }
+                }
+            ).execute()
+            moved = True
+        return moved
 
     def get_zoom_meeting_info(self):
         # We don't keep this huge list of numbers in the spreadsheet, so we need to fetch it when needed
@@ -478,6 +817,31 @@ class Session:
 
     # Schedule the Youtube broadcast for the sessions and populate the sheet
     def schedule_youtube_broadcast(self, thumbnail_params):
+        self.write_entries(self.create_youtube_broadcast(self.render_thumbnail(thumbnail_params)))
+
+    # Render the session's thumbnail image, or load it from thumbnail_params["cache_dir"]
+    # if it was pre-rendered (see prerender_thumbnails.py)
+    def render_thumbnail(self, thumbnail_params):
+        if "cache_dir" in thumbnail_params:
+            return thumbnail.load_cached_thumbnail(thumbnail_params["cache_dir"],
+                    thumbnail_params["background"],
+                    thumbnail_params["bold_font"],
+                    thumbnail_params["regular_font"],
+                    self.title_card_title(),
+                    self.title_card_chair(),
+                    self.title_card_schedule(),
+                    thumbnail_params.get("max_bytes"))
+        return thumbnail.render_thumbnail(thumbnail_params["background"],
+                thumbnail_params["bold_font"],
+                thumbnail_params["regular_font"],
+                self.title_card_title(),
+                self.title_card_chair(),
+                self.title_card_schedule(),
+                thumbnail_params.get("max_bytes"))
+
+    # Create the Youtube broadcast for the session with the rendered thumbnail image,
+    # returning the sheet entries for it
+    def create_youtube_broadcast(self, thumbnail_img):
         title = self.make_youtube_title()
         description = self.make_youtube_description()
         session_time = self.session_time()
@@ -527,24 +891,18 @@ class Session:
             }
         ).execute()
 
-        # Render the thumbnail for the session and upload it
-        thumbnail_img = thumbnail.render_thumbnail(thumbnail_params["background"],
-                thumbnail_params["bold_font"],
-                thumbnail_params["regular_font"],
-                self.title_card_title(),
-                self.title_card_chair(),
-                self.title_card_schedule())
-
+        # Upload the thumbnail for the session
         self.auth.youtube.thumbnails().set(
             videoId=broadcast_info["id"],
-            media_body=MediaIoBaseUpload(thumbnail_img, mimetype="image/png")
+            media_body=MediaIoBaseUpload(thumbnail_img, mimetype=thumbnail.thumbnail_mimetype(thumbnail_img))
         ).execute()
 
-        for t in range(0, len(self.timeslots)):
-            self.timeslot_entry(t, "Youtube Control Room").value = \
-                    "https://studio.youtube.com/video/{}/livestreaming".format(broadcast_info["id"])
-            self.timeslot_entry(t, "Youtube Broadcast").value = "https://youtu.be/{}".format(broadcast_info["id"])
-            self.timeslot_entry(t, "Youtube Chat ID").value = broadcast_info["snippet"]["liveChatId"]
+        youtube_entries = {
+            "Youtube Control Room": "https://studio.youtube.com/video/{}/livestreaming".format(broadcast_info["id"]),
+            "Youtube Broadcast": "https://youtu.be/{}".format(broadcast_info["id"]),
+            "Youtube Chat ID": broadcast_info["snippet"]["liveChatId"]
+        }
+        return youtube_entries
 
     def update_youtube_broadcast_description(self):
         title = self.make_youtube_title()
@@ -588,16 +946,12 @@ class Session:
     def contributor_info_html(self, zoom_meeting_info):
         session_time = self.session_time()
         schedule_html = ""
-        chairs = set()
-        for t in self.timeslots:
-            time = self.day.entry(t, "Time Slot").value
-            time_slot_title = self.day.entry(t, "Time Slot Title").value
-            presenter = self.day.entry(t, "Contributor(s)").value.replace("|", ", ")
+        chairs = self.session_chairs()
+        for t in range(self.num_timeslots()):
+            time = self.timeslot_entry(t, "Time Slot").value
+            time_slot_title = self.timeslot_entry(t, "Time Slot Title").value
+            presenter = self.timeslot_entry(t, "Contributor(s)").value.replace("|", ", ")
             schedule_html += "<li><b>{}</b>: '{}' presented by {}</li>".format(time, time_slot_title, presenter)
-            slot_chairs = self.day.entry(t, "Chair(s)").value
-            if slot_chairs:
-                for c in slot_chairs.split("|"):
-                    chairs.add(c)
 
         # List two numbers for each country, and the one click phone number.
         # Zoom already sends the numbers sorted by country, so no need to re-group them here
@@ -692,20 +1046,7 @@ class Session:
     # the bottom of the email
     def email_contributors(self, logo_image=None):
         # Collect the list of emails for people in the session
-        recipients = set()
-        for t in range(self.num_timeslots()):
-            emails = []
-            if self.timeslot_entry(t, "Contributor Email(s)").value:
-                emails = emails + self.timeslot_entry(t, "Contributor Email(s)").value.split("|")
-
-            if self.timeslot_entry(t, "Chair Email(s)").value:
-                emails = emails + self.timeslot_entry(t, "Chair Email(s)").value.split("|")
-
-            if self.timeslot_entry(t, "Organizer Email(s)").value:
-                emails = emails + self.timeslot_entry(t, "Organizer Email(s)").value.split("|")
-
-            for e in emails:
-                recipients.add(e)
+        recipients = self.session_emails()
 
         # We need the call in numbers list and the call in passcode, which we don't keep in the sheet
         zoom_meeting_info = self.get_zoom_meeting_info()
@@ -778,13 +1119,13 @@ class Session:
                 "inline": False
             })
 
-        for t in self.timeslots:
-            time = self.day.entry(t, "Time Slot").value
-            time_slot_title = self.day.entry(t, "Time Slot Title").value
-            presenter = self.day.entry(t, "Contributor(s)").value.replace("|", ", ")
+        for t in range(self.num_timeslots()):
+            time = self.timeslot_entry(t, "Time Slot").value
+            time_slot_title = self.timeslot_entry(t, "Time Slot Title").value
+            presenter = self.timeslot_entry(t, "Contributor(s)").value.replace("|", ", ")
             field_value = time_slot_title
-            if self.day.entry(t, "Authors").value:
-                authors = self.day.entry(t, "Authors").value.replace("|", ", ")
+            if self.timeslot_entry(t, "Authors").value:
+                authors = self.timeslot_entry(t, "Authors").value.replace("|", ", ")
                 field_value += " by {}.\nPresented by {}".format(authors, presenter)
             else:
                 field_value += " by " + presenter
@@ -829,14 +1170,10 @@ class Session:
         if self.timeslot_entry(0, "Event Type").value == "Tutorial":
             return ""
 
-        chairs = set()
-        for i in range(self.num_timeslots()):
-            if self.timeslot_entry(i, "Chair(s)").value:
-                slot_chairs = self.timeslot_entry(i, "Chair(s)").value.split("|")
-                for c in slot_chairs:
-                    chairs.add(c)
-        return "Chair(s): {}".format(", ".join(list(chairs)))
+        # Sorted so the text (and the cached thumbnail) is the same each time
+        return "Chair(s): {}".format(", ".join(sorted(self.session_chairs())))
 
+    @cached_render
     def title_card_schedule(self):
         schedule_text = ""
         for t in range(len(self.timeslots)):
@@ -855,6 +1192,11 @@ class Session:
         return schedule_text
 
     def __str__(self):
+        return self.session_text()
+
+    # The youtube_url can be passed if the broadcast was created but not written to the sheet yet
+    @cached_render
+    def session_text(self, youtube_url=None):
         # Note: Does not and should not include Zoom info, this is posted on Youtube and the
         # publicly shared calendar file.
         session_time = self.session_time()
@@ -867,8 +1209,10 @@ class Session:
 
         text += "\nSession start: " + format_time(session_time[0]) + \
                 "\nSession end: " + format_time(session_time[1])
-        if self.timeslot_entry(0, "Youtube Broadcast").value:
-            text += "\nYoutube URL: " + self.timeslot_entry(0, "Youtube Broadcast").value
+        if not youtube_url:
+            youtube_url = self.timeslot_entry(0, "Youtube Broadcast").value
+        if youtube_url:
+            text += "\nYoutube URL: " + youtube_url
 
         if self.timeslot_entry(0, "Discord Link").value:
             text += "\nDiscord Link: " + self.timeslot_entry(0, "Discord Link").value
@@ -876,13 +1220,13 @@ class Session:
         if self.timeslot_entry(0, "Chair(s)").value:
             text += "\nSession Chair(s): " + self.timeslot_entry(0, "Chair(s)").value.replace("|", ", ")
 
-        for t in self.timeslots:
-            time = self.day.entry(t, "Time Slot").value
-            time_slot_title = self.day.entry(t, "Time Slot Title").value
-            if self.day.entry(t, "Contributor(s)").value:
-                presenter = self.day.entry(t, "Contributor(s)").value.replace("|", ", ")
-                if self.day.entry(t, "Authors").value:
-                    authors = self.day.entry(t, "Authors").value.replace("|", ", ")
+        for t in range(self.num_timeslots()):
+            time = self.timeslot_entry(t, "Time Slot").value
+            time_slot_title = self.timeslot_entry(t, "Time Slot Title").value
+            if self.timeslot_entry(t, "Contributor(s)").value:
+                presenter = self.timeslot_entry(t, "Contributor(s)").value.replace("|", ", ")
+                if self.timeslot_entry(t, "Authors").value:
+                    authors = self.timeslot_entry(t, "Authors").value.replace("|", ", ")
                     text += "\n    {}: {} by {}.\n    Presented by {}".format(time, time_slot_title, authors, presenter)
                 else:
                     text += "\n    {}: {} by {}".format(time, time_slot_title, presenter)
@@ -890,3 +1234,76 @@ class Session:
                 text += "\n    {}: {}".format(time, time_slot_title)
         return text
 
+# A Session with the values of its time slots read in the same pass over the day sheet
+# as the other sessions, and the time slot times, notes, chairs and emails parsed once.
+# The columns the session writes (SESSION_WRITE_COLUMNS) go through the sheet as for
+# a Session, the others are read from the record's values and can't be written.
+class SessionRecord(Session):
+    __slots__ = ("columns", "values", "times", "notes", "chairs", "emails")
+
+    # columns is the {column name: index} of the values of each time slot,
+    # shared by the records read from the same day
+    def __init__(self, event, name, day, columns):
+        super().__init__(event, name, day)
+        self.columns = columns
+        self.values = []
+        self.times = []
+        self.notes = set()
+        self.chairs = set()
+        self.emails = set()
+
+    def add_timeslot(self, row, values):
+        self.timeslots.append(row)
+        self.values.append(values)
+        value = lambda c: values[self.columns[c]] if c in self.columns else None
+
+        time_slot = value("Time Slot")
+        if time_slot and match_timeslot.match(time_slot):
+            self.times.append(parse_time_slot(time_slot, self.day.month, self.day.day))
+        else:
+            self.times.append(None)
+
+        if value("Special Notes"):
+            self.notes.update(value("Special Notes").split("|"))
+        if value("Speaker Photo"):
+            self.notes.add("Has keynote speaker photo")
+        if value("Custom Title Image"):
+            self.notes.add("Uses custom title image")
+
+        if value("Chair(s)"):
+            self.chairs.update(value("Chair(s)").split("|"))
+        for c in ["Contributor Email(s)", "Chair Email(s)", "Organizer Email(s)"]:
+            if value(c):
+                self.emails.update(value(c).split("|"))
+
+    def timeslot_entry(self, t, item):
+        if item in SESSION_WRITE_COLUMNS:
+            return super().timeslot_entry(t, item)
+        return RecordValue(self.values[t][self.columns[item]])
+
+    def timeslot_time(self, t):
+        return self.times[t]
+
+    def session_time(self):
+        return (self.times[0][0], self.times[-1][1])
+
+    def session_chairs(self):
+        return set(self.chairs)
+
+    def session_emails(self):
+        return set(self.emails)
+
+    def special_notes(self):
+        return set(self.notes)
+
+# Stands in for the cell of a value read with a SessionRecord. The value is read only,
+# since writes to it wouldn't go back to the sheet
+class RecordValue:
+    __slots__ = ("record_value",)
+
+    def __init__(self, value):
+        self.record_value = value
+
+    @property
+    def value(self):
+        return self.record_value
@@ -0,0 +1,313 @@
+import os
+import sqlite3
+import datetime
+import openpyxl
+import urllib.request
+
+import core.excel_db as excel_db
+
+# Columns that are commonly searched on get an SQL index when they're in a table,
+# other columns can be indexed with SqliteTable.add_lookup
+INDEXED_COLUMNS = ["ID", "Event", "Session", "Session ID", "UID", "Event Prefix",
+        "Computer", "Time Slot", "Slug", "video", "Youtube Video"]
+
+def open(filename, read_only=False):
+    return SqliteDb(filename, read_only=read_only)
+
+def quote(name):
+    return "\"" + name.replace("\"", "\"\"") + "\""
+
+# SQLite doesn't store dates and times, so we keep them as ISO 8601 strings tagged
+# with their type, which from_sql_value turns back into dates and times when read.
+# datetime is a date, so it's checked first
+SQL_TIME_TYPES = {
+    "datetime": datetime.datetime,
+    "date": datetime.date,
+    "time": datetime.time
+}
+SQL_TIME_TAG = "\x00"
+
+def to_sql_value(value):
+    for name, time_type in SQL_TIME_TYPES.items():
+        if isinstance(value, time_type):
+            return "{}{}:{}".format(SQL_TIME_TAG, name, value.isoformat())
+    return value
+
+def from_sql_value(value):
+    if type(value) is str and value.startswith(SQL_TIME_TAG):
+        name, time = value[len(SQL_TIME_TAG):].split(":", 1)
+        return SQL_TIME_TYPES[name].fromisoformat(time)
+    return value
+
+# Import each sheet of the Excel workbook into a table in a new SQLite database,
+# along with the named styles of its cells
+def import_workbook(workbook_filename, filename):
+    if os.path.exists(filename):
+        os.remove(filename)
+    workbook = excel_db.open(workbook_filename, snapshot=True)
+    db = SqliteDb(filename)
+    for name in workbook.table_names():
+        sheet = workbook.get_table(name)
+        db.create_sheet(name, len(sheet.columns))
+        rows = zip(*sheet.columns) if sheet.columns else []
+        columns = ", ".join(["c{}".format(c + 1) for c in range(len(sheet.columns))])
+        params = ", ".join(["?"] * (len(sheet.columns) + 1))
+        db.db.executemany("INSERT INTO {} (row, {}) VALUES ({})".format(quote(name), columns, params),
+                [[r + 1] + [to_sql_value(v) for v in values] for r, values in enumerate(rows)])
+        styles = {(c.row, c.column): c.style for r in sheet.table.iter_rows() for c in r if c.style != "Normal"}
+        # Styles set by a journal replayed on opening the workbook aren't in the sheet yet
+        styles.update(sheet.styles)
+        db.db.executemany("INSERT INTO cell_styles (sheet, row, col, style) VALUES (?, ?, ?, ?)",
+                [(name, row, col, style) for (row, col), style in styles.items()])
+        db.get_table(name).create_indexes()
+    workbook.close()
+    db.save()
+    return db
+
+# Export the tables of the SQLite database to an Excel workbook, in the
+# same layout as the workbook it was imported from
+def export_workbook(db, workbook_filename):
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for name in db.table_names():
+        table = db.get_table(name)
+        sheet = workbook.create_sheet(title=name)
+        for row, values in table.rows():
+            for col, v in enumerate(values):
+                if v != None:
+                    sheet.cell(row, col + 1).value = v
+        for row, col, style in db.db.execute("SELECT row, col, style FROM cell_styles WHERE sheet = ?", (name,)):
+            sheet.cell(row, col).style = style
+    workbook.save(workbook_filename)
+
+# An implementation of the ExcelDb interface backed by an SQLite file, where
+# each sheet is a table with an integer primary key "row" for its row number in
+# the sheet and columns c1, c2, ... for the cells in that row. Lookups are done
+# through SQL indexes, and each write (a cell, or a batch of rows with write_rows)
+# is a transaction committed when it's made, so the write lock is only held while
+# writing and bots and scripts can read and update the schedule at the same time.
+# A read-only database is opened with a read-only connection, so writes to it fail.
+class SqliteDb:
+    def __init__(self, filename, read_only=False):
+        self.filename = filename
+        self.read_only = read_only
+        if read_only:
+            self.db = sqlite3.connect("file:{}?mode=ro".format(urllib.request.pathname2url(os.path.abspath(filename))),
+                    uri=True, timeout=60)
+        else:
+            self.db = sqlite3.connect(filename, timeout=60)
+            # Write-ahead logging lets readers continue while a write is in progress
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS cell_styles " +
+                    "(sheet TEXT, row INTEGER, col INTEGER, style TEXT, PRIMARY KEY (sheet, row, col))")
+            self.db.commit()
+        self.tables = {}
+
+    # Writes are committed as they're made, this commits any made directly through
+    # the connection. If an .xlsx file name is passed the database is also exported to it
+    def save(self, filename=None):
+        self.db.commit()
+        if filename and os.path.splitext(filename)[1] == ".xlsx":
+            export_workbook(self, filename)
+
+    def checkpoint(self):
+        self.db.commit()
+
+    def create_sheet(self, name, num_columns):
+        columns = "".join([", c{}".format(c + 1) for c in range(num_columns)])
+        self.db.execute("CREATE TABLE {} (row INTEGER PRIMARY KEY{})".format(quote(name), columns))
+
+    def get_table(self, table_name):
+        if not table_name in self.table_names():
+            raise KeyError("Worksheet {} does not exist.".format(table_name))
+        if not table_name in self.tables:
+            self.tables[table_name] = SqliteTable(self, table_name)
+            self.tables[table_name].load_index()
+        return self.tables[table_name]
+
+    def create_table(self, table, index):
+        self.create_sheet(table, len(index))
+        self.tables[table] = SqliteTable(self, table)
+        self.tables[table].set_index(index)
+        return self.tables[table]
+
+    def table_names(self):
+        return [r[0] for r in self.db.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name != 'cell_styles' ORDER BY rowid")]
+
+class SqliteTable(excel_db.ExcelTable):
+    def __init__(self, db, name):
+        super().__init__(db, None)
+        self.name = name
+        self.quoted_name = quote(name)
+        self.num_columns = len(db.db.execute("SELECT * FROM {} LIMIT 0".format(self.quoted_name)).description) - 1
+
+    def set_index(self, index):
+        super().set_index(index)
+        self.create_indexes()
+
+    def load_index(self):
+        self.index = {}
+        header = self.db.db.execute("SELECT * FROM {} WHERE row = 1".format(self.quoted_name)).fetchone()
+        if header:
+            for col, name in enumerate(header[1:]):
+                # Skip empty columns
+                if not name:
+                    continue
+                self.index[name] = col + 1
+        self.reset_lookups()
+
+    def create_indexes(self):
+        self.load_index()
+        for name in INDEXED_COLUMNS:
+            if name in self.index:
+                self.add_lookup(name)
+
+    def add_lookup(self, attrib):
+        super().add_lookup(attrib)
+        col = self.index[attrib]
+        # The indexes of a read-only database were made when it was written
+        if self.db.read_only:
+            return
+        self.db.db.execute("CREATE INDEX IF NOT EXISTS {} ON {} (c{})".format(
+            quote("{}_c{}".format(self.name, col)), self.quoted_name, col))
+
+    def max_row(self):
+        row = self.db.db.execute("SELECT MAX(row) FROM {}".format(self.quoted_name)).fetchone()[0]
+        return row if row else 0
+
+    def entry(self, row, col):
+        if type(col) is int:
+            return SqliteCell(self, row, col)
+        return SqliteCell(self, row, self.index[col])
+
+    def get_value(self, row, col):
+        if col > self.num_columns:
+            return None
+        value = self.db.db.execute("SELECT c{} FROM {} WHERE row = ?".format(col, self.quoted_name), (row,)).fetchone()
+        return from_sql_value(value[0]) if value else None
+
+    # Writes by other connections to the database are counted too
+    def version(self):
+        return (self.writes, self.db.db.execute("PRAGMA data_version").fetchone()[0])
+
+    def set_value(self, row, col, value):
+        self.reserve(col)
+        self.writes += 1
+        with self.db.db:
+            self.db.db.execute("INSERT OR IGNORE INTO {} (row) VALUES (?)".format(self.quoted_name), (row,))
+            self.db.db.execute("UPDATE {} SET c{} = ? WHERE row = ?".format(self.quoted_name, col),
+                    (to_sql_value(value), row))
+
+    def set_style(self, row, col, style):
+        with self.db.db:
+            self.db.db.execute("INSERT OR REPLACE INTO cell_styles (sheet, row, col, style) VALUES (?, ?, ?, ?)",
+                    (self.name, row, col, style))
+
+    def get_style(self, row, col):
+        style = self.db.db.execute("SELECT style FROM cell_styles WHERE sheet = ? AND row = ? AND col = ?",
+                (self.name, row, col)).fetchone()
+        return style[0] if style else None
+
+    # Add columns to the table to hold col
+    def reserve(self, col):
+        while self.num_columns < col:
+            self.num_columns += 1
+            self.db.db.execute("ALTER TABLE {} ADD COLUMN c{}".format(self.quoted_name, self.num_columns))
+
+    # Iterate the (row, values) of all rows in the table, including the header
+    def rows(self):
+        for r in self.db.db.execute("SELECT * FROM {} ORDER BY row".format(self.quoted_name)):
+            yield r[0], tuple([from_sql_value(v) for v in r[1:]])
+
+    def scan_column(self, col):
+        return [(r, from_sql_value(v)) for r, v in self.db.db.execute(
+            "SELECT row, c{} FROM {} WHERE row >= 2 ORDER BY row".format(col, self.quoted_name))]
+
+    def column_values(self, col):
+        values = [None] * max(self.max_row() - 1, 0)
+        if col <= self.num_columns:
+            for r, v in self.scan_column(col):
+                values[r - 2] = v
+        return values
+
+    def find(self, attrib, value):
+        if value == None:
+            query = "SELECT row FROM {} WHERE row >= 2 AND c{} IS NULL ORDER BY row"
+            params = ()
+        else:
+            query = "SELECT row FROM {} WHERE row >= 2 AND c{} = ? ORDER BY row"
+            params = (to_sql_value(value),)
+        return [r[0] for r in self.db.db.execute(query.format(self.quoted_name, self.index[attrib]), params)]
+
+    def items(self):
+        for r in self.db.db.execute("SELECT row FROM {} WHERE row >= 2 ORDER BY row".format(self.quoted_name)).fetchall():
+            yield excel_db.RowView(self, r[0])
+
+    def write_row(self, row, data):
+        self.write_rows({row: data})
+
+    def write_rows(self, rows):
+        self.writes += 1
+        with self.db.db:
+            self.db.db.executemany("INSERT OR IGNORE INTO {} (row) VALUES (?)".format(self.quoted_name),
+                    [(row,) for row in rows])
+            for row, data in rows.items():
+                if not data:
+                    continue
+                columns = ", ".join(["c{} = ?".format(self.index[k]) for k in data])
+                self.db.db.execute("UPDATE {} SET {} WHERE row = ?".format(self.quoted_name, columns),
+                        [to_sql_value(v) for v in data.values()] + [row])
+
+    def fill_column(self, rows, column, value):
+        col = column if type(column) is int else self.index[column]
+        self.reserve(col)
+        self.writes += 1
+        with self.db.db:
+            self.db.db.executemany("INSERT OR IGNORE INTO {} (row) VALUES (?)".format(self.quoted_name),
+                    [(row,) for row in rows])
+            self.db.db.executemany("UPDATE {} SET c{} = ? WHERE row = ?".format(self.quoted_name, col),
+                    [(to_sql_value(value), row) for row in rows])
+
+    def append_rows(self, rows):
+        first_row = max(self.max_row(), 1) + 1
+        rows = [self.row_values(data) for data in rows]
+        columns = "".join([", c{}".format(c + 1) for c in range(self.num_columns)])
+        params = ", ".join(["?"] * (self.num_columns + 1))
+        self.writes += 1
+        with self.db.db:
+            self.db.db.executemany("INSERT INTO {} (row{}) VALUES ({})".format(self.quoted_name, columns, params),
+                    [[first_row + r] + values for r, values in enumerate(rows)])
+        return list(range(first_row, first_row + len(rows)))
+
+    # Map a dict of data to the list of values for columns c1, c2, ...
+    def row_values(self, data):
+        values = [None] * self.num_columns
+        for k, v in data.items():
+            values[self.index[k] - 1] = to_sql_value(v)
+        return values
+
+# Stands in for the openpyxl Cell of an entry in an SqliteTable
+class SqliteCell:
+    __slots__ = ("sheet", "row", "column")
+
+    def __init__(self, sheet, row, column):
+        self.sheet = sheet
+        self.row = row
+        self.column = column
+
+    @property
+    def value(self):
+        return self.sheet.get_value(self.row, self.column)
+
+    @value.setter
+    def value(self, value):
+        self.sheet.set_value(self.row, self.column, value)
+
+    @property
+    def style(self):
+        return self.sheet.get_style(self.row, self.column)
+
+    @style.setter
+    def style(self, style):
+        self.sheet.set_style(self.row, self.column, style)
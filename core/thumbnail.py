@@ -1,6 +1,54 @@
 import io
+import os
+import json
+import hashlib
+import functools
 from PIL import Image, ImageDraw, ImageFont
 
+# NOTE: You'll want to change these font file names with the ones you're using
+# in your streaming software.
+BOLD_FONT = "MPLUSRounded1c-Black.ttf"
+REGULAR_FONT = "MPLUSRounded1c-Regular.ttf"
+
+# YouTube's size limit for thumbnail images
+THUMBNAIL_MAX_BYTES = 2 * 1024 * 1024
+
+# The JPEG qualities tried when encoding a thumbnail to fit in a size budget, in order
+JPEG_QUALITIES = [90, 80, 70, 60]
+
+# The file extension for each thumbnail image mimetype
+THUMBNAIL_EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg"
+}
+
+# The thumbnail_params for Session.render_thumbnail. If a cache_dir is given the
+# thumbnails pre-rendered there are used, and new ones are saved to it. The thumbnails
+# are encoded as the smallest image under max_bytes, or as a full color PNG if it's None
+def make_thumbnail_params(background_file, font_root, cache_dir=None, max_bytes=THUMBNAIL_MAX_BYTES):
+    params = {
+        "background": background_file,
+        "bold_font": os.path.join(font_root, BOLD_FONT),
+        "regular_font": os.path.join(font_root, REGULAR_FONT),
+        "max_bytes": max_bytes
+    }
+    if cache_dir:
+        params["cache_dir"] = cache_dir
+    return params
+
+# The fonts loaded at each size, so the font files aren't parsed again for each text fit
+@functools.lru_cache(maxsize=256)
+def load_font(font_file, size):
+    return ImageFont.truetype(font_file, size=size)
+
+# The decoded background images, reused across thumbnails until the file is modified.
+# Copy the image before drawing on it
+@functools.lru_cache(maxsize=8)
+def load_background(background_file, modified_time):
+    background = Image.open(background_file)
+    background.load()
+    return background
+
 def compute_text_bounds(text, font):
     ascent, descent = font.getmetrics()
     lines = text.split("\n")
@@ -11,7 +59,9 @@ def compute_text_bounds(text, font):
         text_bounds[1] += box[3] + descent
     return text_bounds
 
-# Binary search to fit the biggest text we can in the bounds specified
+# Binary search to fit the biggest text we can in the bounds specified. The font fit
+# is remembered, since the same text is often fit again (e.g., chairs and schedules)
+@functools.lru_cache(maxsize=4096)
 def fit_text_to_bounds(text, font_file, width, height, max_font_size=0):
     max_size = min(height, 128)
     if max_font_size > 0:
@@ -21,7 +71,7 @@ def fit_text_to_bounds(text, font_file, width, height, max_font_size=0):
     bounds = None
     while max_size > min_size:
         size = int((max_size + min_size) / 2)
-        font = ImageFont.truetype(font_file, size=size)
+        font = load_font(font_file, size)
         bounds = compute_text_bounds(text, font)
         if bounds[0] > width or bounds[1] > height:
             max_size = size - 1
@@ -29,10 +79,44 @@ def fit_text_to_bounds(text, font_file, width, height, max_font_size=0):
             min_size = size + 1
     return font
 
-# Renders the thumbnail out to an io.BytesIO object
+# Get the mimetype of the encoded thumbnail image in the io.BytesIO object
+def thumbnail_mimetype(img_bytes):
+    header = img_bytes.getvalue()[0:8]
+    if header.startswith(b"\x89PNG"):
+        return "image/png"
+    if header.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    raise ValueError("Thumbnail is not a PNG or JPEG image")
+
+def save_image(image, **kwargs):
+    img_bytes = io.BytesIO()
+    image.save(img_bytes, **kwargs)
+    return img_bytes
+
+# Encode the thumbnail image as the smallest of a palette PNG and a JPEG, out to an
+# io.BytesIO object. The thumbnails are mostly flat text on a background, which often
+# fits in a 256 color palette PNG without visible loss, while JPEG does better on
+# photo backgrounds. If neither is under max_bytes the JPEG quality is lowered until
+# it fits, and a ValueError is raised if it doesn't fit at the lowest quality
+def encode_thumbnail(image, max_bytes=THUMBNAIL_MAX_BYTES):
+    image = image.convert("RGB")
+    encoded = [save_image(image.quantize(colors=256), format="png", optimize=True),
+        save_image(image, format="jpeg", quality=JPEG_QUALITIES[0], optimize=True)]
+    smallest = min(encoded, key=lambda e: len(e.getvalue()))
+    for quality in JPEG_QUALITIES[1:]:
+        if len(smallest.getvalue()) <= max_bytes:
+            break
+        smallest = save_image(image, format="jpeg", quality=quality, optimize=True)
+    if len(smallest.getvalue()) > max_bytes:
+        raise ValueError("Thumbnail is {} bytes at the lowest JPEG quality, over the {} byte limit".format(
+            len(smallest.getvalue()), max_bytes))
+    return smallest
+
+# Renders the thumbnail out to an io.BytesIO object, as a full color PNG or, if max_bytes
+# is given, encoded by encode_thumbnail. Use thumbnail_mimetype to get the image type
 # NOTE: You'll probably want to adjust the text placement to better
 # fit your own session title layout
-def render_thumbnail(background_file, bold_font_file, regular_font_file, title, chair, schedule):
+def render_thumbnail(background_file, bold_font_file, regular_font_file, title, chair, schedule, max_bytes=None):
     # If we don't have a space between consecutive newlines they'll be lost and we'll miscompute
     # the text height
     schedule = schedule.replace("\n\n", "\n \n")
@@ -41,13 +125,64 @@ def render_thumbnail(background_file, bold_font_file, regular_font_file, title,
     chair_font = fit_text_to_bounds(chair, regular_font_file, 1920 - 80, 72)
     schedule_font = fit_text_to_bounds(schedule, regular_font_file, 1920 - 100, 680, max_font_size=40)
 
-    background = Image.open(background_file)
+    background = load_background(background_file, os.path.getmtime(background_file)).copy()
     draw = ImageDraw.Draw(background)
     draw.text((24, 180), title, font=title_font, fill="black")
     draw.text((24, 280), chair, font=chair_font, fill="black")
     draw.text((24, 370), schedule, font=schedule_font, fill="black")
 
-    img_bytes = io.BytesIO()
-    background.save(img_bytes, format="png")
-    return img_bytes
+    if max_bytes != None:
+        return encode_thumbnail(background, max_bytes)
+    return save_image(background, format="png")
+
+
+# The SHA-256 of the file's contents, until the file is modified
+@functools.lru_cache(maxsize=32)
+def file_digest(filename, modified_time):
+    with open(filename, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+# The path of the thumbnail in the cache directory (without the file extension), named by
+# a hash of the background and font files, the text and max_bytes, so a thumbnail is only
+# rendered again if one of them changed
+def cached_thumbnail_path(cache_dir, background_file, bold_font_file, regular_font_file, title, chair, schedule,
+        max_bytes=None):
+    key = hashlib.sha256()
+    for f in [background_file, bold_font_file, regular_font_file]:
+        key.update(file_digest(f, os.path.getmtime(f)).encode("utf8"))
+    key.update(json.dumps([title, chair, schedule, max_bytes]).encode("utf8"))
+    return os.path.join(cache_dir, key.hexdigest())
+
+# Find the cached thumbnail file for the path from cached_thumbnail_path, returns None if
+# it hasn't been rendered
+def find_cached_thumbnail(path):
+    for extension in THUMBNAIL_EXTENSIONS.values():
+        if os.path.exists(path + extension):
+            return path + extension
+    return None
+
+# Render the thumbnail into the cache directory if it's not there already, returns its path
+def render_cached_thumbnail(cache_dir, background_file, bold_font_file, regular_font_file, title, chair, schedule,
+        max_bytes=None):
+    path = cached_thumbnail_path(cache_dir, background_file, bold_font_file, regular_font_file, title, chair, schedule,
+            max_bytes)
+    cached_path = find_cached_thumbnail(path)
+    if cached_path == None:
+        img_bytes = render_thumbnail(background_file, bold_font_file, regular_font_file, title, chair, schedule,
+                max_bytes)
+        cached_path = path + THUMBNAIL_EXTENSIONS[thumbnail_mimetype(img_bytes)]
+        # Write to a temp file first so other processes never read a partially written thumbnail
+        temp_path = "{}.{}.tmp".format(cached_path, os.getpid())
+        with open(temp_path, "wb") as f:
+            f.write(img_bytes.getvalue())
+        os.replace(temp_path, cached_path)
+    return cached_path
 
+# Load the thumbnail from the cache directory out to an io.BytesIO object,
+# rendering it first if it's not there
+def load_cached_thumbnail(cache_dir, background_file, bold_font_file, regular_font_file, title, chair, schedule,
+        max_bytes=None):
+    path = render_cached_thumbnail(cache_dir, background_file, bold_font_file, regular_font_file, title, chair, schedule,
+            max_bytes)
+    with open(path, "rb") as f:
+        return io.BytesIO(f.read())
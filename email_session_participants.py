@@ -14,7 +14,7 @@ if len(sys.argv) < 3:
 database = schedule.Database(sys.argv[1], email=True)
 
 day = database.get_day(sys.argv[2])
-sessions = day.get_sessions(False)
+sessions = day.get_sessions(False, records=True)
 
 logo_image = None
 if len(sys.argv) == 4:
@@ -12,7 +12,7 @@ if len(sys.argv) < 3:
     print("Usage: {} <data sheet.xlsx> <base dir> <out_dir> [--img] [--ics]".format(sys.argv[0]))
     sys.exit(1)
 
-database = schedule.Database(sys.argv[1])
+database = schedule.Database(sys.argv[1], read_only=True)
 export_images = "--img" in sys.argv
 export_ics = "--ics" in sys.argv
 img_asset_dir = sys.argv[2]
@@ -26,11 +26,10 @@ event_calendars = {}
 
 paper_list = {}
 all_sessions = {}
-conference_days = ["sunday", "monday", "tuesday", "wednesday", "thursday", "friday"]
-for d in conference_days:
+for d in schedule.CONFERENCE_DAYS:
     print(d)
     day = database.get_day(d)
-    sessions = day.get_sessions(False)
+    sessions = day.get_sessions(False, records=True)
 
     for k, v in sessions.items():
         session_time = v.session_time()
@@ -0,0 +1,67 @@
+import sys
+from datetime import timedelta
+
+import core.schedule as schedule
+import core.capacity_planner as capacity_planner
+
+USAGE = """Usage: {} <data sheet.xlsx> [options]
+
+    Find the minimum number of stream computers needed to stream the sessions on each day
+    of the conference, and simulate sessions running over to estimate the probability of a
+    session not having a computer available with different numbers of computers.
+
+    Options:
+        --buffer <minutes>          The time a computer is kept free after a session ends (default 10)
+        --scenarios <N>             The number of overrun scenarios to simulate (default 10000)
+        --overrun-prob <p>          The probability of a session running over (default 0.25)
+        --mean-overrun <minutes>    The mean time sessions that run over run over by (default 5)
+        --seed <seed>               The random seed for the simulation
+"""
+
+if "-h" in sys.argv or len(sys.argv) < 2:
+    print(USAGE.format(sys.argv[0]))
+    sys.exit(0)
+
+buffer = timedelta(minutes=10)
+num_scenarios = 10000
+overrun_probability = 0.25
+mean_overrun = timedelta(minutes=5)
+seed = None
+for i in range(2, len(sys.argv)):
+    if sys.argv[i] == "--buffer":
+        buffer = timedelta(minutes=float(sys.argv[i + 1]))
+    elif sys.argv[i] == "--scenarios":
+        num_scenarios = int(sys.argv[i + 1])
+    elif sys.argv[i] == "--overrun-prob":
+        overrun_probability = float(sys.argv[i + 1])
+    elif sys.argv[i] == "--mean-overrun":
+        mean_overrun = timedelta(minutes=float(sys.argv[i + 1]))
+    elif sys.argv[i] == "--seed":
+        seed = int(sys.argv[i + 1])
+
+database = schedule.Database(sys.argv[1], read_only=True)
+num_computers = len(list(database.computers.items()))
+table_names = database.workbook.table_names()
+
+all_sessions = []
+print("Minimum computers needed with a {} buffer after each session:".format(buffer))
+for d in schedule.CONFERENCE_DAYS:
+    if not d in table_names:
+        continue
+    sessions = list(database.get_day(d).get_sessions(False, records=True).values())
+    all_sessions += sessions
+    print("    {}: {} sessions, {} computers".format(d, len(sessions),
+        capacity_planner.minimum_computers(capacity_planner.SessionTimes(sessions), buffer)))
+
+session_times = capacity_planner.SessionTimes(all_sessions)
+min_computers = capacity_planner.minimum_computers(session_times, buffer)
+print("The conference needs at least {} computers, there are {} in the schedule sheet".format(
+    min_computers, num_computers))
+
+print("Simulating {} scenarios where sessions run over with probability {} by {} on average".format(
+    num_scenarios, overrun_probability, mean_overrun))
+computers_needed = capacity_planner.simulate_overruns(session_times, num_scenarios,
+        overrun_probability, mean_overrun, buffer, seed)
+counts = range(min_computers, max(min_computers, int(computers_needed.max())) + 1)
+for c, p in capacity_planner.conflict_probability(computers_needed, counts).items():
+    print("    {} computers: {:.2%} probability of a session with no computer available".format(c, p))
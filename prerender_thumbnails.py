@@ -0,0 +1,60 @@
+import sys
+import os
+import concurrent.futures
+
+import core.schedule as schedule
+import core.thumbnail as thumbnail
+
+# This script renders the YouTube thumbnails of all sessions on the days passed into a
+# cache directory, in parallel over a pool of processes. The thumbnails are named by a
+# hash of their text, background and fonts, so sessions that haven't changed since
+# they were last rendered are skipped. Pass the cache directory to schedule_day.py
+# with --thumbnail-cache to use the pre-rendered thumbnails.
+
+def main():
+    if len(sys.argv) < 6:
+        print("Usage: {} <data sheet.xlsx> <thumbnail file> <font root> <cache dir> <day> [<day>...] [--processes <n>]".format(sys.argv[0]))
+        sys.exit(1)
+
+    processes = None
+    args = sys.argv[1:]
+    if "--processes" in args:
+        i = args.index("--processes")
+        processes = int(args[i + 1])
+        args = args[:i] + args[i + 2:]
+
+    cache_dir = args[3]
+    days = args[4:]
+    thumbnail_params = thumbnail.make_thumbnail_params(args[1], args[2], cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    database = schedule.Database(args[0], read_only=True)
+
+    # Collect the text of the thumbnails that aren't rendered yet
+    thumbnails = {}
+    num_sessions = 0
+    for d in days:
+        day = database.get_day(d)
+        for v in day.get_sessions(False, records=True).values():
+            if v.timeslot_entry(0, "Time Slot Type").value == "Zoom Only":
+                continue
+            num_sessions += 1
+            text = (v.title_card_title(), v.title_card_chair(), v.title_card_schedule())
+            path = thumbnail.cached_thumbnail_path(cache_dir, thumbnail_params["background"],
+                    thumbnail_params["bold_font"], thumbnail_params["regular_font"], *text, thumbnail_params["max_bytes"])
+            if thumbnail.find_cached_thumbnail(path) == None:
+                thumbnails[path] = (v.event_session_title(), text)
+
+    print("Rendering {} of {} session thumbnails".format(len(thumbnails), num_sessions))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {}
+        for path, (title, text) in thumbnails.items():
+            f = executor.submit(thumbnail.render_cached_thumbnail, cache_dir, thumbnail_params["background"],
+                    thumbnail_params["bold_font"], thumbnail_params["regular_font"], *text, thumbnail_params["max_bytes"])
+            futures[f] = title
+        for f in concurrent.futures.as_completed(futures):
+            print("Rendered {}: {}".format(futures[f], f.result()))
+
+# The worker processes import this script, so it only runs when it's the main program
+if __name__ == "__main__":
+    main()
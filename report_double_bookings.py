@@ -0,0 +1,27 @@
+import sys
+
+import core.schedule as schedule
+import core.double_booking as double_booking
+
+# This script reports the people (by name or email) who are contributors, chairs
+# or organizers in overlapping time slots of different sessions, over all days of
+# the conference. It exits with status 1 if anyone is double booked.
+
+if len(sys.argv) != 2:
+    print("Usage: {} <data sheet.xlsx>".format(sys.argv[0]))
+    sys.exit(1)
+
+database = schedule.Database(sys.argv[1], read_only=True)
+timeslots = double_booking.booked_timeslots(database)
+double_bookings = double_booking.find_double_bookings(timeslots)
+
+for b in double_bookings:
+    people = ", ".join(sorted([p.split(":", 1)[1] for p in b.people]))
+    print("{} booked in overlapping time slots:".format(people))
+    for slot in [b.first, b.second]:
+        print("    {} {}: {} - {}".format(schedule.format_time(slot.start), slot.time_slot(),
+            slot.session.event_session_title(), slot.session.timeslot_entry(slot.timeslot, "Time Slot Title").value))
+
+print("Checked {} time slots, found {} double bookings".format(len(timeslots), len(double_bookings)))
+if len(double_bookings) > 0:
+    sys.exit(1)
@@ -18,18 +18,11 @@ if len(sys.argv) < 3:
 
 video_root = sys.argv[2]
 conference_days = ["sunday", "monday", "tuesday", "wednesday", "thursday", "friday"]
-schedule_book = excel_db.open(sys.argv[1])
+schedule_book = excel_db.open(sys.argv[1], read_only=True)
 
-# Read the known slugs to record any missing ones
+# Look up the known slugs to record any missing ones
 slug_sheet = schedule_book.get_table("session_slugs")
-known_slugs = {}
-for r in range(2, slug_sheet.table.max_row + 1):
-    if not slug_sheet.entry(r, "Slug").value:
-        continue
-    known_slugs[slug_sheet.entry(r, "Slug").value] = {
-        "Event": slug_sheet.entry(r, "Event").value,
-        "Session": slug_sheet.entry(r, "Session").value
-    }
+slug_sheet.add_lookup("Slug")
 
 missing_videos_index = ["Event", "Session", "Time Slot Title",
         "Video File Name", "Full Path", "Video Missing", "Subtitles Missing"]
@@ -37,6 +30,7 @@ missing_info_index = ["Time Slot", "Event", "Session", "Time Slot Title", "Items
 
 missing_items_db = excel_db.ExcelDb()
 missing_slug_sheet = missing_items_db.create_table("missing_slugs", slug_sheet.index)
+missing_slug_sheet.add_lookup("Slug")
 total_videos_missing = 0
 total_subtitles_missing = 0
 total_info_missing = 0
@@ -45,7 +39,9 @@ for day in conference_days:
     sheet = schedule_book.get_table(day)
     missing_videos_sheet = missing_items_db.create_table(day + "-videos", missing_videos_index)
     missing_info_sheet = missing_items_db.create_table(day + "-info", missing_info_index)
-    for r in range(3, sheet.table.max_row + 1):
+    missing_videos = []
+    missing_info_rows = []
+    for r in range(3, sheet.max_row() + 1):
         # Skip empty rows
         if not sheet.entry(r, "Time Slot").value:
             continue
@@ -68,7 +64,7 @@ for day in conference_days:
                     total_videos_missing += 1
                 else:
                     total_subtitles_missing += 1
-                missing_videos_sheet.append_row({
+                missing_videos.append({
                     "Event": event,
                     "Session": session,
                     "Time Slot Title": title,
@@ -85,7 +81,7 @@ for day in conference_days:
                 image_path = os.path.join(video_root, image_file)
                 if not os.path.isfile(image_path):
                     total_info_missing += 1
-                    missing_info_sheet.append_row({
+                    missing_info_rows.append({
                         "Time Slot": row_info["Time Slot"].value,
                         "Event": row_info["Event"].value,
                         "Session": row_info["Session"].value,
@@ -100,7 +96,7 @@ for day in conference_days:
                 missing_info.append(k)
         if len(missing_info) > 0:
             total_info_missing += 1
-            missing_info_sheet.append_row({
+            missing_info_rows.append({
                 "Time Slot": row_info["Time Slot"].value,
                 "Event": row_info["Event"].value,
                 "Session": row_info["Session"].value,
@@ -110,7 +106,7 @@ for day in conference_days:
 
         # Also report any slugs missing the session slugs list
         slug = row_info["Session ID"].value
-        if slug and slug not in known_slugs and slug != "BREAK":
+        if slug and not slug_sheet.find("Slug", slug) and slug != "BREAK":
             if not missing_slug_sheet.find("Slug", slug):
                 total_unknown_slugs += 1
                 missing_slug_sheet.append_row({
@@ -119,6 +115,9 @@ for day in conference_days:
                     "Session": row_info["Session"].value,
                 })
 
+    missing_videos_sheet.append_rows(missing_videos)
+    missing_info_sheet.append_rows(missing_info_rows)
+
 missing_items_db.save("missing_items_db.xlsx")
 print("There are {} total missing videos".format(total_videos_missing))
 print("There are {} total missing subtitles".format(total_subtitles_missing))
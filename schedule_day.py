@@ -1,91 +1,144 @@
 import sys
 import os
 import json
+import pickle
 import discord
 from datetime import datetime, timedelta
-from heapq import heappush, heappop
 
 import core.schedule as schedule
+import core.computer_schedule as computer_schedule
+import core.provisioning as provisioning
+import core.thumbnail as thumbnail
 
 # This script will create the YouTube broadcasts, Zoom Meetings and Discord channels
 # for each session in your conference and assign them to specific computers for streaming
-# during the event.
+# during the event. With --incremental, the computers already assigned in the sheet are
+# kept and only the sessions that are new or now conflict are (re)assigned and scheduled.
+# The broadcasts and meetings of sessions already scheduled are moved to their time slot
+# if it changed since they were scheduled, which is kept in <data sheet.xlsx>.scheduled_times.
+# With --workers <n>, n sessions are provisioned at once and the sheet is written once
+# all of them are done. With --thumbnail-cache <dir>, the thumbnails pre-rendered by
+# prerender_thumbnails.py are used.
 
 if(not "DATA_FOLDER" in os.environ):
     print("You must set $DATA_FOLDER to a folder which contains the working data of this tool.")
     sys.exit(1)
 
 if len(sys.argv) < 5:
-    print("Usage: {} <data sheet.xlsx> <day> <thumbnail file> <font root>".format(sys.argv[0]))
+    print("Usage: {} <data sheet.xlsx> <day> <thumbnail file> <font root> [--incremental] [--workers <n>] [--thumbnail-cache <dir>] [--no-discord]".format(sys.argv[0]))
     sys.exit(1)
 
-def getNextAvailableMachine(computers, time):
-    for computer_id in computers.keys():
-        avail_at, pc_id = computers[computer_id]
-        if(avail_at <= time):
-            return pc_id
-    return None
-
 f = open(os.environ["DATA_FOLDER"] + "/discordIDs.dat", "rb")
 discordIDs = pickle.load(f)
 f.close()
 
 discord_guild_id = discordIDs["Server"]
-thumbnail_params = {
-    "background": sys.argv[3],
-    # NOTE: You'll want to change these font file names with the ones you're using
-    # in your streaming software.
-    "bold_font": os.path.join(sys.argv[4], "MPLUSRounded1c-Black.ttf"),
-    "regular_font": os.path.join(sys.argv[4], "MPLUSRounded1c-Regular.ttf")
-}
-
-database = schedule.Database(sys.argv[1], youtube=True, use_pickled_credentials=True)
+thumbnail_cache = None
+if "--thumbnail-cache" in sys.argv:
+    thumbnail_cache = sys.argv[sys.argv.index("--thumbnail-cache") + 1]
+# NOTE: The font file names are set in core/thumbnail.py
+thumbnail_params = thumbnail.make_thumbnail_params(sys.argv[3], sys.argv[4], thumbnail_cache)
+
+# Saving after each session only journals the new cells, the workbook is written
+# out in full at checkpoints
+database = schedule.Database(sys.argv[1], youtube=True, use_pickled_credentials=True, journal=True)
 # Fill in the computer stream key IDs
 database.populate_stream_key_ids()
 
 day = database.get_day(sys.argv[2])
 sessions = day.get_sessions(False)
 
-event_dict = {}
-
-computer_dict = {}
-
+computers = []
 for c in database.computers.items():
     if not c["Youtube Stream Key ID"].value:
         print("Failed to get stream key ID for computer {}, aborting!".format(c["ID"].value))
         sys.exit(1)
-    # All computers are initially marked as available starting at midnight
-    avail_at = datetime(schedule.CONFERENCE_YEAR, day.month, day.day, hour=0, minute=1, tzinfo=schedule.conf_tz)
-    # We also include the ID as a tiebreaker for when all the computers have the same time,
-    # since the dicts are not comparable
-    computer_dict[c["ID"].value] = (avail_at, c["ID"].value)
-
-for k, v in sessions.items():
-    session_time = v.session_time()
-    if(v.event not in event_dict.keys()):
-        event_dict[v.event] = getNextAvailableMachine(computer_dict, session_time[0] - v.setup_time())
-    current_computer = event_dict[v.event]
-    avail_at, pc_id = computer_dict[current_computer]
-    # We need some setup time ahead of the session's start time to do A/V check with the presenters
-    need_at = session_time[0] - v.setup_time()
-    if(avail_at > need_at):
-        print("Parallel session of same type?")
-        current_computer = getNextAvailableMachine(computer_dict, session_time[0] - v.setup_time())
-        avail_at, pc_id = computer_dict[current_computer]
-    if avail_at > need_at:
-        print("The next available computer isn't available until {},".format(schedule.format_time(avail_at)) + \
-              " which is after the next session {} - {} that needs a computer for setup starting at: {}!"
-              .format(v.event, v.name, schedule.format_time(need_at)))
-        sys.exit(1)
+    computers.append(c["ID"].value)
+
+# All computers are initially marked as available starting at midnight. We need some setup
+# time ahead of each session's start time to do A/V check with the presenters, and the computer
+# is available again 10 minutes after the session ends for buffer
+day_start = datetime(schedule.CONFERENCE_YEAR, day.month, day.day, hour=0, minute=1, tzinfo=schedule.conf_tz)
+incremental = "--incremental" in sys.argv
+# The sessions already scheduled whose time slot moved since their broadcast and meeting were made
+scheduled_times = database.load_scheduled_times()
+retimed = [v for v in sessions.values() if v.timeslot_entry(0, "Zoom Meeting ID").value and \
+        v.scheduled_time(scheduled_times) != v.session_time()]
+if incremental:
+    current = {v: v.timeslot_entry(0, "Computer").value for v in sessions.values()}
+    streams = computer_schedule.reassign_computers(list(sessions.values()), computers, current,
+            available_at=day_start, retimed=retimed)
+    print("{} sessions need a new computer:".format(len(streams.changed)))
+    for s in streams.changed:
+        print("    {}: {} -> {}".format(s.session.event_session_title(), current[s.session], s.computer))
+    # Sessions that failed part way through being scheduled keep their computer, but
+    # still need the broadcast or meeting that wasn't created
+    changed = set(streams.changed)
+    incomplete = [s for s in streams.sessions if not s in changed and not s.session.is_scheduled()]
+    print("{} sessions weren't fully scheduled:".format(len(incomplete)))
+    for s in incomplete:
+        print("    {} on computer {}".format(s.session.event_session_title(), s.computer))
+    to_schedule = sorted(streams.changed + incomplete, key=lambda s: s.need_at)
+else:
+    streams = computer_schedule.assign_computers(list(sessions.values()), computers, available_at=day_start)
+    to_schedule = streams.sessions
+for s in streams.moved:
+    print("Parallel session of same type? {} moved to computer {}".format(s.session.event_session_title(), s.computer))
+# Check all sessions can be streamed before we create anything for them
+for s in streams.conflicts:
+    print("The next available computer isn't available until {},".format(schedule.format_time(s.available_at)) + \
+          " which is after the next session {} - {} that needs a computer for setup starting at: {}!"
+          .format(s.session.event, s.session.name, schedule.format_time(s.need_at)))
+if len(streams.conflicts) > 0:
+    sys.exit(1)
 
-    print("Session streams on computer {}".format(pc_id))
-    v.create_virtual_session(pc_id, thumbnail_params)
-    print(v)
+# Sessions already scheduled whose time slot moved need their broadcast and meeting moved with them
+for v in retimed:
+    if v.reschedule_virtual_session():
+        print("Moved the YouTube broadcast and Zoom meeting of {} to {} - {}".format(v.event_session_title(),
+            *[schedule.format_time(t) for t in v.session_time()]))
+
+failed = []
+if "--workers" in sys.argv:
+    new_sessions = []
+    for s in to_schedule:
+        v = s.session
+        # Sessions already scheduled keep their broadcast and meeting, only the computer changes
+        if incremental and v.is_scheduled():
+            v.assign_computer(s.computer)
+            print("Session {} was already scheduled, make computer {} the host of Zoom meeting {}".format(
+                v.event_session_title(), s.computer, v.timeslot_entry(0, "Zoom Meeting ID").value))
+        else:
+            new_sessions.append(s)
+
+    workers = int(sys.argv[sys.argv.index("--workers") + 1])
+    provisioned = provisioning.provision_sessions(new_sessions, thumbnail_params, workers=workers)
+    provisioning.commit_provisioned(provisioned)
     database.save("../../Schedule/" + sys.argv[2] + "_scheduled.xlsx")
-    print("------")
-    # The computer is available again 10 minutes after this session ends for buffer
-    avail_at = session_time[1] + timedelta(minutes=10)
-    computer_dict[current_computer] = (avail_at, pc_id)
+    failed = [p.session for p in provisioned if p.error != None]
+else:
+    for s in to_schedule:
+        v = s.session
+        print("Session streams on computer {}".format(s.computer))
+        # Sessions already scheduled keep their broadcast and meeting, only the computer changes
+        if incremental and v.is_scheduled():
+            v.assign_computer(s.computer)
+            print("Session was already scheduled, make computer {} the host of Zoom meeting {}".format(
+                s.computer, v.timeslot_entry(0, "Zoom Meeting ID").value))
+        else:
+            v.create_virtual_session(s.computer, thumbnail_params)
+        print(v)
+        database.save("../../Schedule/" + sys.argv[2] + "_scheduled.xlsx")
+        print("------")
+
+database.save_scheduled_times(sessions.values())
+database.checkpoint()
+
+if len(failed) > 0:
+    print("{} sessions failed to be provisioned, the items created for them before the error were saved:".format(len(failed)))
+    for v in failed:
+        print("    {}".format(v.event_session_title()))
+    sys.exit(1)
 
 if "--no-discord" in sys.argv:
     print("Not creating Discord channels")
@@ -153,6 +206,7 @@ async def on_ready():
 
     print("Saving database")
     database.save(sys.argv[2] + "_scheduled.xlsx")
+    database.checkpoint()
     print("Setup complete, hit ctrl-c to end bot and exit")
 
 client.run(database.auth.discord["bot_token"])
@@ -26,7 +26,7 @@ if "-h" in sys.argv or len(sys.argv) > 4:
     """.format(sys.argv[0]))
     sys.exit(0)
 
-database = schedule.Database(sys.argv[1], youtube=True, use_pickled_credentials=True)
+database = schedule.Database(sys.argv[1], youtube=True, use_pickled_credentials=True, cache=True)
 client = discord.Client()
 
 day = database.get_day(sys.argv[2])
@@ -47,26 +47,24 @@ async def on_ready():
             hour=int(sys.argv[3][0:2]), minute=int(sys.argv[3][2:4]), tzinfo=schedule.conf_tz)
 
     print("Bot handling sessions:")
-    for k, v in day.get_sessions(False).items():
-        time = v.session_time()
-        if bot_time >= time[0] and bot_time <= time[1]:
-            if not v.timeslot_entry(0, "Youtube Chat ID").value or not v.timeslot_entry(0, "Discord Link").value:
-                print("No chat sync for {}".format(v.event_session_title()))
-                continue
-
-            guild_id, channel_id = v.discord_ids()
-            guild = [g for g in client.guilds if str(g.id) == guild_id][0]
-            for cat in guild.categories:
-                channel = [c for c in guild.text_channels if str(c.id) == channel_id]
-                if len(channel) > 0:
-                    channel = channel[0]
-                    break
-
-            print(v.event_session_title())
-            video_stats[v.youtube_broadcast_id()] = []
-            videos[v.youtube_broadcast_id()] = v
-            channels[v.youtube_broadcast_id()] = channel
-            prev_message[v.youtube_broadcast_id()] = None
+    for v in day.session_intervals().live_at(bot_time):
+        if not v.timeslot_entry(0, "Youtube Chat ID").value or not v.timeslot_entry(0, "Discord Link").value:
+            print("No chat sync for {}".format(v.event_session_title()))
+            continue
+
+        guild_id, channel_id = v.discord_ids()
+        guild = [g for g in client.guilds if str(g.id) == guild_id][0]
+        for cat in guild.categories:
+            channel = [c for c in guild.text_channels if str(c.id) == channel_id]
+            if len(channel) > 0:
+                channel = channel[0]
+                break
+
+        print(v.event_session_title())
+        video_stats[v.youtube_broadcast_id()] = []
+        videos[v.youtube_broadcast_id()] = v
+        channels[v.youtube_broadcast_id()] = channel
+        prev_message[v.youtube_broadcast_id()] = None
 
     client.loop.create_task(update_viewer_stats())
 
@@ -76,9 +74,10 @@ async def update_viewer_stats():
         await asyncio.sleep(60)
         current_time = datetime.now()
         elapsed = current_time - last_send
+        all_stats = database.get_broadcast_statistics(list(video_stats.keys()))
         for v, views in video_stats.items():
             video = videos[v]
-            stats = video.get_broadcast_statistics()
+            stats = all_stats.get(v, {})
             if "concurrentViewers" in stats:
                 viewers = int(stats['concurrentViewers'])
                 views.append(viewers)
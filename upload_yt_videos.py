@@ -16,7 +16,9 @@ Usage:
 
 arguments = docopt(USAGE)
 
-video_db = excel_db.open(arguments["<video_list.xlsx>"])
+# Saving after each video only journals the new cells, the workbook is written
+# out in full at the end
+video_db = excel_db.open(arguments["<video_list.xlsx>"], journal=True)
 video_table = video_db.get_table("Sheet1")
 video_root_path = arguments["<video_root_path>"]
 update_descriptions = not arguments["--no-update"]
@@ -91,10 +93,12 @@ if not "Youtube Video" in video_table.index or not "Youtube Playlist" in video_t
     if not "Youtube Playlist" in video_table.index:
         index.append("Youtube Playlist")
     video_table.set_index(index)
+# Videos are looked up by their URL when adding them to playlists
+video_table.add_lookup("Youtube Video")
 
 # Validate the input sheet
 all_files_found = True
-for r in range(2, video_table.table.max_row + 1):
+for r in range(2, video_table.max_row() + 1):
     video_info = video_table.row(r)
     # If there's no video, or it was already uploaded, skip verifying the file
     # exists because we don't need it
@@ -129,7 +133,7 @@ for pl in yt_playlists:
     for i in items:
         current_playlists[title]["videos"].append(i["snippet"]["resourceId"]["videoId"])
 
-for r in range(2, video_table.table.max_row + 1):
+for r in range(2, video_table.max_row() + 1):
     video_info = video_table.row(r)
     if not video_info["Title"].value:
         continue
@@ -237,4 +241,5 @@ for pl, videos in playlists.items():
         video_db.save(arguments["<video_list.xlsx>"])
 
 video_db.save(arguments["<video_list.xlsx>"])
+video_db.checkpoint()
 